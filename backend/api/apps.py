@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        """
+        Регистрирует шрифты для PDF и подключает сигналы при старте
+        приложения.
+        """
+        from . import signals  # noqa: F401
+        from .pdf import register_fonts
+
+        register_fonts()
@@ -0,0 +1,209 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+
+REFERENCE_CACHE_MAX_ENTRIES = 1000
+REFERENCE_CACHE_TTL = 300
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_VERSION_KEY = 'recipes_response_version'
+
+
+class ReferenceDataCache:
+    """
+    Кеш готовых JSON-ответов в памяти процесса для справочных данных.
+    Версия таблицы повышается сигналами при изменении данных, при этом
+    кеш очищается. Записи живут не дольше REFERENCE_CACHE_TTL секунд,
+    чтобы подхватывать изменения из других процессов. Last-Modified
+    пересобранной записи сдвигается, только если изменилось содержимое.
+    """
+    def __init__(self, max_entries=REFERENCE_CACHE_MAX_ENTRIES,
+                 ttl=REFERENCE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.version = 0
+
+    def invalidate(self):
+        """Повышает версию таблицы и очищает кеш."""
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def get(self, key):
+        """
+        Возвращает запись из кеша или None. Устаревшая запись остается
+        в кеше до пересборки, чтобы сравнить с ней новое содержимое.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry['created_at'] > self.ttl:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, content):
+        """Сохраняет содержимое ответа и возвращает запись."""
+        etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is None:
+                last_modified = time.time()
+            elif previous['etag'] == etag:
+                last_modified = previous['last_modified']
+            else:
+                # Заголовок хранит время с точностью до секунды.
+                last_modified = max(
+                    time.time(), previous['last_modified'] + 1
+                )
+            entry = {
+                'content': content,
+                'etag': etag,
+                'last_modified': last_modified,
+                'created_at': time.monotonic(),
+            }
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+
+tags_cache = ReferenceDataCache()
+ingredients_cache = ReferenceDataCache()
+
+
+class ReferenceDataCacheMixin:
+    """
+    Миксин для вьюсетов справочных данных. Отдает list и retrieve из
+    кеша reference_cache с заголовками ETag и Last-Modified и отвечает
+    304, если данные клиента не изменились.
+    """
+    reference_cache = None
+
+    def cached_response(self, request, get_response):
+        if request.accepted_renderer.format != JSONRenderer.format:
+            return get_response()
+        key = (
+            self.action,
+            self.kwargs.get(self.lookup_url_kwarg or self.lookup_field),
+            tuple(
+                (param, tuple(values))
+                for param, values in sorted(request.query_params.lists())
+            ),
+        )
+        entry = self.reference_cache.get(key)
+        if entry is None:
+            response = get_response()
+            if response.status_code != 200:
+                return response
+            entry = self.reference_cache.set(
+                key, JSONRenderer().render(response.data)
+            )
+        response = HttpResponse(
+            entry['content'], content_type=JSONRenderer.media_type
+        )
+        response['ETag'] = entry['etag']
+        response['Last-Modified'] = http_date(entry['last_modified'])
+        return get_conditional_response(
+            request,
+            etag=entry['etag'],
+            last_modified=int(entry['last_modified']),
+            response=response
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(ReferenceDataCacheMixin, self).list(
+                request, *args, **kwargs
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, lambda: super(ReferenceDataCacheMixin, self).retrieve(
+                request, *args, **kwargs
+            )
+        )
+
+
+def get_response_cache_version():
+    """Возвращает текущую версию кеша ответов о рецептах."""
+    return caches[RESPONSE_CACHE_ALIAS].get_or_set(
+        RESPONSE_CACHE_VERSION_KEY, 1, None
+    )
+
+
+def bump_response_cache_version():
+    """Сбрасывает кеш ответов о рецептах, повышая его версию."""
+    cache = caches[RESPONSE_CACHE_ALIAS]
+    try:
+        cache.incr(RESPONSE_CACHE_VERSION_KEY)
+    except ValueError:
+        cache.set(RESPONSE_CACHE_VERSION_KEY, 1, None)
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Миксин, кеширующий list и retrieve для анонимных пользователей.
+    Для гостей ответы не зависят от пользователя, поэтому готовый JSON
+    хранится в кеше RESPONSE_CACHE_ALIAS под ключом из адреса и
+    нормализованных параметров запроса. Сигналы повышают версию кеша
+    при изменении рецептов, тегов, ингредиентов и профилей.
+    """
+
+    def anonymous_cached_response(self, request, get_response):
+        if (
+            request.user.is_authenticated
+            or request.accepted_renderer.format != JSONRenderer.format
+        ):
+            return get_response()
+        # Ссылки на изображения абсолютные, поэтому хост входит в ключ.
+        params = repr((
+            request.scheme,
+            request.get_host(),
+            self.kwargs.get(self.lookup_url_kwarg or self.lookup_field),
+            sorted(
+                (param, sorted(values))
+                for param, values in request.query_params.lists()
+            ),
+        ))
+        key = '{}:{}:{}'.format(
+            self.basename,
+            self.action,
+            hashlib.md5(params.encode()).hexdigest()
+        )
+        cache = caches[RESPONSE_CACHE_ALIAS]
+        version = get_response_cache_version()
+        content = cache.get(key, version=version)
+        if content is None:
+            response = get_response()
+            if response.status_code != 200:
+                return response
+            content = JSONRenderer().render(response.data)
+            cache.set(key, content, version=version)
+        return HttpResponse(content, content_type=JSONRenderer.media_type)
+
+    def list(self, request, *args, **kwargs):
+        return self.anonymous_cached_response(
+            request, lambda: super(AnonymousResponseCacheMixin, self).list(
+                request, *args, **kwargs
+            )
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.anonymous_cached_response(
+            request,
+            lambda: super(AnonymousResponseCacheMixin, self).retrieve(
+                request, *args, **kwargs
+            )
+        )
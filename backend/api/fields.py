@@ -1,18 +1,128 @@
 import base64
+import binascii
+from tempfile import SpooledTemporaryFile
 
-from django.core.files.base import ContentFile
+from django.core.files import File
+from PIL import Image
 from rest_framework import serializers
 
+from recipes.constants import (IMAGE_DECODE_CHUNK_SIZE,
+                               IMAGE_RENDITION_FORMATS, IMAGE_SPOOL_MAX_SIZE,
+                               IMAGE_UPLOAD_FORMATS, IMAGE_UPLOAD_MAX_PIXELS,
+                               IMAGE_UPLOAD_MAX_SIZE)
+from recipes.renditions import is_ready, rendition_name
+
+BASE64_MARKER = ';base64,'
+
+
+def decoded_size(data, start):
+    """Размер данных после декодирования base64, без самого декодирования."""
+    size = (len(data) - start) * 3 // 4
+    return size - data.count('=', max(start, len(data) - 2))
+
+
+def decode_base64(data, start):
+    """Декодирует base64 по частям во временный файл.
+
+    В памяти держится не больше одного чанка, крупные файлы
+    сбрасываются на диск.
+    """
+    # Длина чанка кратна четырём, чтобы не разрывать группы base64.
+    step = IMAGE_DECODE_CHUNK_SIZE // 3 * 4
+    file = SpooledTemporaryFile(max_size=IMAGE_SPOOL_MAX_SIZE)
+    try:
+        for offset in range(start, len(data), step):
+            file.write(base64.b64decode(
+                data[offset:offset + step], validate=True
+            ))
+    except binascii.Error:
+        file.close()
+        raise
+    file.seek(0)
+    return file
+
 
 class ImageField(serializers.ImageField):
     """Поле для изображений с base64 кодировкой."""
+    default_error_messages = {
+        'invalid_base64': 'Некорректные данные base64.',
+        'max_size': 'Размер изображения не должен превышать {max_size} байт.',
+        'max_pixels': (
+            'Изображение не должно содержать больше {max_pixels} пикселей.'
+        ),
+        'invalid_format': 'Формат изображения не поддерживается.',
+    }
+
     def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            file_format, image_data = data.split(';base64,')
-            extension = file_format.split('/')[-1]
-            user_id = self.context['request'].user.id
-            data = ContentFile(
-                base64.b64decode(image_data),
-                name=f'image_{user_id}.{extension}'
-            )
-        return super().to_internal_value(data)
+        if not (isinstance(data, str) and data.startswith('data:image')):
+            return super().to_internal_value(data)
+        start = data.find(BASE64_MARKER, 0, 64)
+        if start == -1:
+            self.fail('invalid_image')
+        start += len(BASE64_MARKER)
+        if decoded_size(data, start) > IMAGE_UPLOAD_MAX_SIZE:
+            self.fail('max_size', max_size=IMAGE_UPLOAD_MAX_SIZE)
+        try:
+            file = decode_base64(data, start)
+        except binascii.Error:
+            self.fail('invalid_base64')
+        extension = self.check_image(file)
+        user_id = self.context['request'].user.id
+        # Проверка Pillow уже выполнена по заголовку, поэтому повторную
+        # полную проверку из serializers.ImageField пропускаем.
+        return serializers.FileField.to_internal_value(
+            self, File(file, name=f'image_{user_id}.{extension}')
+        )
+
+    def check_image(self, file):
+        """Проверяет формат и размеры изображения по заголовку файла.
+
+        Pillow читает только заголовок, пиксели не декодируются.
+        Возвращает расширение по фактическому формату файла.
+        """
+        try:
+            with Image.open(file) as image:
+                image_format = image.format
+                width, height = image.size
+        except Exception:
+            file.close()
+            self.fail('invalid_image')
+        file.seek(0)
+        if image_format not in IMAGE_UPLOAD_FORMATS:
+            file.close()
+            self.fail('invalid_format')
+        if width * height > IMAGE_UPLOAD_MAX_PIXELS:
+            file.close()
+            self.fail('max_pixels', max_pixels=IMAGE_UPLOAD_MAX_PIXELS)
+        return IMAGE_UPLOAD_FORMATS[image_format]
+
+
+class RenditionsField(serializers.ReadOnlyField):
+    """
+    Поле со ссылками на уменьшенные копии изображения. Пока копия
+    не готова, вместо нее отдается ссылка на оригинал.
+    """
+    def __init__(self, renditions, **kwargs):
+        self.renditions = renditions
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        result = {}
+        for rendition in self.renditions:
+            ready = is_ready(value.name, rendition, value.storage)
+            urls = {}
+            for image_format in IMAGE_RENDITION_FORMATS:
+                url = (
+                    value.storage.url(
+                        rendition_name(value.name, rendition, image_format)
+                    )
+                    if ready else value.url
+                )
+                urls[image_format] = (
+                    request.build_absolute_uri(url) if request else url
+                )
+            result[rendition] = urls
+        return result
@@ -1,23 +1,81 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Case, IntegerField, Q, Value, When
+from django.db import connection
+from django.db.models import Case, Exists, IntegerField, OuterRef, Value, When
+from django.db.models.functions import Lower
 from django_filters.rest_framework import (BooleanFilter, CharFilter,
-                                           FilterSet,
-                                           ModelMultipleChoiceFilter)
+                                           FilterSet, MultipleChoiceFilter)
 
-from recipes.models import Ingredients, Recipes, Tags
+from recipes.constants import MAX_INGREDIENTS_LIMIT
+from recipes.models import Favorites, Ingredients, Recipes, ShoppingList
+from recipes.search import ingredients_index, search_recipes, tags_index
+
+from .validators import ingredients_limit_validator
 
 User = get_user_model()
 
 
+def tags_choices():
+    """Варианты фильтра по тегам из индекса в памяти процесса."""
+    return tags_index.choices()
+
+
 class RecipesFilter(FilterSet):
     """Фильтр для рецептов."""
-    is_favorited = BooleanFilter()
-    is_in_shopping_cart = BooleanFilter()
-    tags = ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tags.objects.all(),
+    is_favorited = BooleanFilter(method='filter_user_recipes')
+    is_in_shopping_cart = BooleanFilter(method='filter_user_recipes')
+    tags = MultipleChoiceFilter(
+        choices=tags_choices,
+        method='filter_tags'
     )
+    search = CharFilter(method='filter_search')
+
+    def filter_tags(self, queryset, name, value):
+        """
+        Отбирает рецепты хотя бы с одним из тегов. EXISTS по таблице
+        связей не размножает строки, поэтому DISTINCT не нужен, и
+        рецепты читаются в порядке индекса ленты до заполнения страницы.
+        """
+        return queryset.filter(
+            Exists(
+                Recipes.tags.through.objects.filter(
+                    recipes=OuterRef('pk'),
+                    tags__in=tags_index.ids(value)
+                )
+            )
+        )
+
+    def filter_search(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по названию и описанию. Сначала идут
+        самые релевантные рецепты, при равной релевантности - обычный
+        порядок ленты.
+        """
+        return search_recipes(queryset, value).order_by(
+            '-search_rank', *Recipes._meta.ordering
+        )
+
+    user_recipes_models = {
+        'is_favorited': Favorites,
+        'is_in_shopping_cart': ShoppingList,
+    }
+
+    def filter_user_recipes(self, queryset, name, value):
+        """
+        Отбирает рецепты из избранного или списка покупок. Запрос
+        начинается со строк пользователя по индексу user_id, а не
+        проверяет подзапросом каждый рецепт. У гостя этих списков нет.
+        """
+        user = getattr(self.request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return queryset.none() if value else queryset
+        recipe_ids = (
+            self.user_recipes_models[name].objects
+            .filter(user=user)
+            .values('recipe')
+        )
+        if value:
+            return queryset.filter(pk__in=recipe_ids)
+        return queryset.exclude(pk__in=recipe_ids)
 
     class Meta:
         model = Recipes
@@ -25,29 +83,63 @@ class RecipesFilter(FilterSet):
 
 
 class IngredientsFilter(FilterSet):
-    """Фильтр для ингредиентов."""
+    """
+    Фильтр для ингредиентов. Сначала идут ингредиенты, название которых
+    начинается с искомой строки, затем остальные совпадения.
+    На PostgreSQL поиск идет по индексам pg_trgm и Lower(name),
+    на остальных базах - по индексу в памяти процесса: он отбирает
+    и упорядочивает не больше limit id, а порядок передается в запрос
+    списком позиций.
+    """
     name = CharFilter(method='filter_name')
 
     def filter_name(self, queryset, name, value):
-        if value:
+        if not value:
+            return queryset
+        if connection.vendor == 'postgresql':
+            value = value.lower()
             return (
                 queryset
-                .filter(name__icontains=value)
+                .annotate(name_lower=Lower('name'))
+                .filter(name_lower__contains=value)
                 .annotate(
                     priority=Case(
-                        When(name__istartswith=value, then=Value(0)),
-                        When(
-                            Q(name__icontains=value)
-                            & ~Q(name__istartswith=value),
-                            then=Value(1)
-                        ),
-                        default=Value(2),
+                        When(name_lower__startswith=value, then=Value(0)),
+                        default=Value(1),
                         output_field=IntegerField(),
                     )
                 )
                 .order_by('priority', 'name')
             )
-        return queryset
+        ids = ingredients_index.search(value, self.get_limit(self.data))
+        return (
+            queryset
+            .filter(pk__in=ids)
+            .annotate(
+                position=Case(
+                    *(
+                        When(pk=pk, then=Value(position))
+                        for position, pk in enumerate(ids)
+                    ),
+                    default=Value(len(ids)),
+                    output_field=IntegerField(),
+                )
+            )
+            .order_by('position')
+        )
+
+    @staticmethod
+    def get_limit(params):
+        """
+        Возвращает размер выдачи из параметра limit. Поиск по названию
+        без limit отдает не больше MAX_INGREDIENTS_LIMIT подсказок.
+        """
+        limit = params.get('limit')
+        if limit is not None:
+            return ingredients_limit_validator(limit)
+        if params.get('name'):
+            return MAX_INGREDIENTS_LIMIT
+        return None
 
     class Meta:
         model = Ingredients
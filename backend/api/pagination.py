@@ -1,8 +1,270 @@
+import hashlib
+import json
+from functools import partial
+from urllib.parse import urlencode
+
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+PAGINATION_QUERY_PARAM = 'pagination'
+CURSOR_PAGINATION = 'cursor'
+COUNT_CACHE_TIMEOUT = 30
+COUNT_CACHE_VERSION_KEY = 'recipes_count_version'
+COUNT_ESTIMATE_THRESHOLD = 100000
+
+
+def get_count_version():
+    """Возвращает текущую версию кеша количества рецептов."""
+    return cache.get_or_set(COUNT_CACHE_VERSION_KEY, 1, None)
+
+
+def bump_count_version():
+    """Сбрасывает кеш количества рецептов, повышая его версию."""
+    try:
+        cache.incr(COUNT_CACHE_VERSION_KEY)
+    except ValueError:
+        cache.set(COUNT_CACHE_VERSION_KEY, 1, None)
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Пагинатор, который берет количество объектов из кеша. Для больших
+    таблиц на PostgreSQL может вместо COUNT(*) использовать оценку
+    reltuples из статистики планировщика.
+    """
+    def __init__(self, *args, count_key=None, count_timeout=None,
+                 estimate=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_key = count_key
+        self.count_timeout = count_timeout
+        self.estimate = estimate
+
+    def estimated_count(self):
+        """Возвращает оценку числа строк таблицы или None."""
+        if not self.estimate or connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [self.object_list.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row is None or row[0] < COUNT_ESTIMATE_THRESHOLD:
+            return None
+        return row[0]
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+        count = cache.get(self.count_key)
+        if count is None:
+            count = self.estimated_count()
+            if count is None:
+                count = super().count
+            cache.set(self.count_key, count, self.count_timeout)
+        return count
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация по ключу из всех полей ordering. CursorPagination
+    из DRF хранит в курсоре только первое поле и смещение среди строк
+    с равным значением, поэтому при множестве строк с одной датой снова
+    появляются сканы со смещением. Здесь курсор хранит значения всех
+    полей, а страница отбирается условием "строго после ключа". Последнее
+    поле ordering должно быть уникальным, тогда смещение не нужно.
+    """
+
+    def get_position(self, instance):
+        """Возвращает позицию объекта в курсоре: значения полей ordering."""
+        return json.dumps([
+            str(getattr(instance, order.lstrip('-')))
+            for order in self.ordering
+        ])
+
+    def _get_position_from_instance(self, instance, ordering):
+        return self.get_position(instance)
+
+    def get_keyset_filter(self, queryset, ordering, position):
+        """
+        Условие "строго после позиции" для порядка ordering: для
+        (-a, b, c) это a < x OR a = x AND b > y OR a = x AND b = y AND
+        c > z. Граница a <= x по первому полю позволяет базе начать
+        чтение индекса с позиции, а не с начала.
+        """
+        try:
+            values = json.loads(position)
+            if len(values) != len(ordering):
+                raise ValueError
+            values = [
+                queryset.model._meta.get_field(order.lstrip('-'))
+                .to_python(value)
+                for order, value in zip(ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        after = Q()
+        equal = {}
+        for order, value in zip(ordering, values):
+            attr = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') else 'gt'
+            after |= Q(**equal, **{f'{attr}__{lookup}': value})
+            equal[attr] = value
+        lead = ordering[0]
+        lookup = 'lte' if lead.startswith('-') else 'gte'
+        return Q(**{f'{lead.lstrip("-")}__{lookup}': values[0]}) & after
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor else None
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(
+                order[1:] if order.startswith('-') else f'-{order}'
+                for order in ordering
+            )
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(queryset, ordering, position)
+            )
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > len(self.page):
+            following = self.get_position(results[-1])
+        if reverse:
+            self.page.reverse()
+            self.next_position, self.previous_position = position, following
+        else:
+            self.next_position, self.previous_position = following, position
+        self.has_next = self.next_position is not None
+        self.has_previous = self.previous_position is not None
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class RecipesCursorPagination(KeysetCursorPagination):
+    """
+    Курсорная пагинация для ленты рецептов. Не считает COUNT(*)
+    и не использует OFFSET, поэтому дальние страницы отдаются так же
+    быстро, как первая.
+    """
+    page_size_query_param = 'limit'
+    page_size = settings.DEFAULT_PAGE_SIZE
+    ordering = ('-created_at', 'name', 'id')
+
+
+class UsersCursorPagination(RecipesCursorPagination):
+    """Курсорная пагинация для списков пользователей."""
+    ordering = ('-date_joined', 'username', 'id')
 
 
 class RecipesPagination(PageNumberPagination):
-    """Кастомная пагинация для API."""
+    """
+    Кастомная пагинация для API. С параметром pagination=cursor
+    переключается на курсорную пагинацию. Количество рецептов кешируется
+    по набору фильтров на count_cache_timeout секунд, кеш сбрасывается
+    при создании и удалении рецептов.
+    """
+    page_size_query_param = 'limit'
+    page_size = settings.DEFAULT_PAGE_SIZE
+    cursor_pagination_class = RecipesCursorPagination
+    cursor_paginator = None
+    count_cache_timeout = COUNT_CACHE_TIMEOUT
+    user_dependent_params = ('is_favorited', 'is_in_shopping_cart')
+    # Результаты поиска меняются и при правке рецептов, а сброс кеша
+    # происходит только при создании и удалении.
+    uncached_params = ('search',)
+
+    def get_count_filters(self, request):
+        """Возвращает нормализованные параметры фильтрации запроса."""
+        skip = {
+            self.page_query_param,
+            self.page_size_query_param,
+            PAGINATION_QUERY_PARAM,
+            self.cursor_pagination_class.cursor_query_param,
+            settings.REST_FRAMEWORK.get('URL_FORMAT_OVERRIDE', 'format'),
+        }
+        return sorted(
+            (param, sorted(values))
+            for param, values in request.query_params.lists()
+            if param not in skip
+        )
+
+    def get_count_cache_key(self, request, view):
+        """
+        Возвращает ключ кеша количества или None, если количество
+        зависит от пользователя или от текста рецептов и кешировать
+        его нельзя.
+        """
+        if self.count_cache_timeout is None:
+            return None
+        filters = self.get_count_filters(request)
+        if any(
+            param in self.user_dependent_params
+            or param in self.uncached_params
+            for param, _ in filters
+        ):
+            return None
+        digest = hashlib.md5(
+            urlencode(filters, doseq=True).encode()
+        ).hexdigest()
+        basename = getattr(view, 'basename', None)
+        return f'recipes_count:{get_count_version()}:{basename}:{digest}'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (
+            request.query_params.get(PAGINATION_QUERY_PARAM)
+            == CURSOR_PAGINATION
+        ):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        self.django_paginator_class = partial(
+            CachedCountPaginator,
+            count_key=self.get_count_cache_key(request, view),
+            count_timeout=self.count_cache_timeout,
+            estimate=not self.get_count_filters(request),
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class CookableRecipesPagination(PageNumberPagination):
+    """
+    Пагинация рецептов, подобранных по ингредиентам. Ранжированный
+    список строится целиком, поэтому курсор и кеш количества не нужны.
+    """
     page_size_query_param = 'limit'
     page_size = settings.DEFAULT_PAGE_SIZE
+
+
+class UsersPagination(RecipesPagination):
+    """
+    Пагинация для списков пользователей. Списки зависят от пользователя,
+    поэтому количество не кешируется.
+    """
+    cursor_pagination_class = UsersCursorPagination
+    count_cache_timeout = None
@@ -0,0 +1,53 @@
+import io
+
+from django.conf import settings
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+PDF_START_X = 40
+PDF_START_Y = 800
+PDF_BOTTOM_Y = 40
+PDF_LINE_HEIGHT = 20
+PDF_HEADER_MARGIN = 10
+PDF_FONT = 'Carlito'
+PDF_FONT_FILE = 'Carlito-Regular.ttf'
+PDF_FONT_SIZE = 14
+PDF_HEADER_FONT_SIZE = 18
+
+
+def register_fonts():
+    """Регистрирует шрифт для PDF. Вызывается один раз при старте."""
+    font_path = str(settings.BASE_DIR / 'fonts' / PDF_FONT_FILE)
+    pdfmetrics.registerFont(TTFont(PDF_FONT, font_path))
+
+
+def shopping_cart_pdf(ingredients):
+    """
+    Создает PDF-файл со списком покупок и возвращает его содержимое.
+    Если строки не помещаются на страницу, список продолжается
+    на следующей.
+    """
+    x = PDF_START_X
+    y = PDF_START_Y
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer)
+    pdf.setTitle('Мой список покупок')
+    pdf.setFont(PDF_FONT, PDF_HEADER_FONT_SIZE)
+    pdf.drawString(x, y, 'Список покупок:')
+    y -= PDF_HEADER_MARGIN
+    pdf.setFont(PDF_FONT, PDF_FONT_SIZE)
+    for item in ingredients:
+        y -= PDF_LINE_HEIGHT
+        if y < PDF_BOTTOM_Y:
+            pdf.showPage()
+            pdf.setFont(PDF_FONT, PDF_FONT_SIZE)
+            y = PDF_START_Y
+        pdf.drawString(
+            x, y,
+            f'- {item["name"]} {item["amount"]} {item["measurement_unit"]}'
+        )
+
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
@@ -0,0 +1,82 @@
+import csv
+from abc import ABCMeta, abstractmethod
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .pdf import shopping_cart_pdf
+
+
+class ShoppingCartRenderer(BaseRenderer, metaclass=ABCMeta):
+    """
+    Базовый рендерер списка покупок. Ответы с ошибками отдаются в JSON.
+    """
+    charset = 'utf-8'
+
+    @abstractmethod
+    def render_content(self, ingredients):
+        """Возвращает содержимое файла со списком покупок."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None and response.exception:
+            response['Content-Type'] = JSONRenderer.media_type
+            return JSONRenderer().render(data)
+        return self.render_content(data)
+
+
+class ShoppingCartStreamRenderer(ShoppingCartRenderer):
+    """
+    Рендерер списка покупок, который умеет отдавать список построчно,
+    чтобы ответ можно было стримить прямо из итератора кварисета.
+    """
+
+    @abstractmethod
+    def stream(self, ingredients):
+        """Возвращает генератор строк списка покупок."""
+
+    def render_content(self, ingredients):
+        return ''.join(self.stream(ingredients)).encode(self.charset)
+
+
+class ShoppingCartTextRenderer(ShoppingCartStreamRenderer):
+    """Рендерер списка покупок в виде текста."""
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        yield 'Список покупок:\n'
+        for item in ingredients:
+            yield (
+                f'- {item["name"]} {item["amount"]} '
+                f'{item["measurement_unit"]}\n'
+            )
+
+
+class Echo:
+    """Псевдобуфер для csv.writer, возвращающий записанную строку."""
+    def write(self, value):
+        return value
+
+
+class ShoppingCartCSVRenderer(ShoppingCartStreamRenderer):
+    """Рендерер списка покупок в формате CSV."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for item in ingredients:
+            yield writer.writerow(
+                (item['name'], item['measurement_unit'], item['amount'])
+            )
+
+
+class ShoppingCartPDFRenderer(ShoppingCartRenderer):
+    """Рендерер списка покупок в PDF."""
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def render_content(self, ingredients):
+        return shopping_cart_pdf(ingredients)
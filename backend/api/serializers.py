@@ -4,28 +4,46 @@ from django.db import transaction
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
 
-from recipes.models import Ingredients, Recipes, RecipesIngredients, Tags
+from foodgram_backend.metrics import measure
+from recipes.counters import change_counter
+from recipes.models import (Ingredients, Recipes, RecipesIngredients,
+                            ShoppingCartItem, Tags)
 
-from .fields import ImageField
-from .validators import ingredients_validator, tags_validator
+from .fields import ImageField, RenditionsField
+from .validators import (ingredients_validator, recipes_limit_validator,
+                         tags_validator)
 
 User = get_user_model()
 
 
-class ExtendedUserSerializer(UserSerializer):
+class TimedRepresentationMixin:
+    """Учитывает время сериализации в метриках запроса."""
+
+    def to_representation(self, instance):
+        with measure('serializer'):
+            return super().to_representation(instance)
+
+
+class ExtendedUserSerializer(TimedRepresentationMixin, UserSerializer):
     """Кастомный сериализатор для пользователя с дополнительными полями."""
     is_subscribed = serializers.SerializerMethodField('check_subscription',)
     avatar = serializers.ImageField(required=False, allow_null=True)
+    avatar_renditions = RenditionsField(
+        source='avatar', renditions=('avatar',)
+    )
 
     class Meta(UserSerializer.Meta):
         model = User
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name',
-            'is_subscribed', 'avatar'
+            'is_subscribed', 'avatar', 'avatar_renditions',
+            'recipes_count', 'followers_count'
         ]
 
     def check_subscription(self, obj):
         """Проверяет, подписан ли пользователь на данного автора."""
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return (
             request
@@ -34,7 +52,7 @@ class ExtendedUserSerializer(UserSerializer):
         )
 
 
-class AvatarSerializer(serializers.ModelSerializer):
+class AvatarSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
     """Сериализатор обновления аватара."""
     avatar = ImageField(required=True, allow_null=False)
 
@@ -49,7 +67,9 @@ class AvatarSerializer(serializers.ModelSerializer):
         return value
 
 
-class IngredientsSerializer(serializers.ModelSerializer):
+class IngredientsSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
     """Сериализатор ингредиентов."""
 
     class Meta:
@@ -57,7 +77,7 @@ class IngredientsSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class TagsSerialiser(serializers.ModelSerializer):
+class TagsSerialiser(TimedRepresentationMixin, serializers.ModelSerializer):
     """Сериализатор тегов."""
 
     class Meta:
@@ -81,15 +101,22 @@ class IngredientsAmountSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'measurement_unit', 'amount']
 
 
-class RecipeFavoritesSerializer(serializers.ModelSerializer):
+class RecipeFavoritesSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
     """Сериализатор избранных рецептов."""
+    image_renditions = RenditionsField(
+        source='image', renditions=('card', 'detail')
+    )
 
     class Meta:
         model = Recipes
-        fields = ['id', 'name', 'image', 'cooking_time']
+        fields = ['id', 'name', 'image', 'image_renditions', 'cooking_time']
 
 
-class RecipesWriteSerializer(serializers.ModelSerializer):
+class RecipesWriteSerializer(
+    TimedRepresentationMixin, serializers.ModelSerializer
+):
     """Сериализатор для записи рецептов."""
     image = ImageField()
     ingredients = IngredientsAmountSerializer(
@@ -139,19 +166,65 @@ class RecipesWriteSerializer(serializers.ModelSerializer):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipes.objects.create(**validated_data)
+        change_counter(
+            User.objects.filter(pk=request.user.pk), 'recipes_count', 1
+        )
         recipe.tags.set(tags)
         self.save_ingredients_and_amount(recipe, ingredients)
         return recipe
 
+    def update_ingredients(self, recipe, ingredients):
+        """
+        Приводит ингредиенты рецепта к новому списку, меняя только
+        отличающиеся строки. Возвращает изменение количества
+        по каждому ингредиенту: {id ингредиента: разница}.
+        """
+        new_amounts = {
+            item['ingredient'].id: item['amount'] for item in ingredients
+        }
+        changes = dict.fromkeys(new_amounts, 0)
+        rows, to_update, to_delete = {}, [], []
+        for row in recipe.recipe_ingredients.all():
+            changes[row.ingredient_id] = (
+                changes.get(row.ingredient_id, 0) - row.amount
+            )
+            if row.ingredient_id in rows or (
+                row.ingredient_id not in new_amounts
+            ):
+                to_delete.append(row.pk)
+            else:
+                rows[row.ingredient_id] = row
+        for ingredient_id, amount in new_amounts.items():
+            changes[ingredient_id] += amount
+            row = rows.get(ingredient_id)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                to_update.append(row)
+        RecipesIngredients.objects.filter(pk__in=to_delete).delete()
+        RecipesIngredients.objects.bulk_update(to_update, ['amount'])
+        RecipesIngredients.objects.bulk_create(
+            RecipesIngredients(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in rows
+        )
+        return changes
+
     @transaction.atomic
     def update(self, instance, validated_data):
         """Обновляет рецепт."""
         ingredients = validated_data.pop('ingredients', None)
         tags = validated_data.pop('tags', None)
         instance = super().update(instance, validated_data)
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.save_ingredients_and_amount(instance, ingredients)
+        if tags is not None:
+            # set() сам вычисляет разницу и не трогает оставшиеся теги.
+            instance.tags.set(tags)
+        if ingredients is not None:
+            ShoppingCartItem.objects.change_amounts(
+                instance.shoppinglist_recipes.values_list('user', flat=True),
+                self.update_ingredients(instance, ingredients)
+            )
         return instance
 
     def to_representation(self, instance):
@@ -176,28 +249,49 @@ class RecipesReadSerializer(RecipeFavoritesSerializer):
 
     class Meta:
         model = Recipes
-        exclude = ('short_link', 'created_at')
+        exclude = ('short_link', 'created_at', 'updated_at')
+
+    def to_representation(self, instance):
+        """Передает автору аннотацию подписки из кварисета рецептов."""
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        return super().to_representation(instance)
+
+
+class CookableRecipesSerializer(RecipesReadSerializer):
+    """
+    Сериализатор рецептов, подобранных по имеющимся ингредиентам.
+    Доля имеющихся ингредиентов и число недостающих проставляются
+    вьюсетом.
+    """
+    coverage = serializers.FloatField(read_only=True)
+    missing_count = serializers.IntegerField(read_only=True)
 
 
 class SubscriptionsSerializer(ExtendedUserSerializer):
     """Сериализатор подписок."""
-    recipes_count = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = (
             'id', 'username', 'email', 'first_name', 'last_name',
-            'is_subscribed', 'avatar', 'recipes', 'recipes_count'
+            'is_subscribed', 'avatar', 'avatar_renditions', 'recipes',
+            'recipes_count', 'followers_count'
         )
 
     def get_recipes(self, obj):
         """Получает рецепты пользователя."""
-        request = self.context.get('request')
-        recipes_limit = request.query_params.get(
-            'recipes_limit', settings.DEFAULT_PAGE_SIZE
-        )
-        recipes = obj.recipes.all()[:int(recipes_limit)]
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            request = self.context.get('request')
+            recipes_limit = recipes_limit_validator(
+                request.query_params.get(
+                    'recipes_limit', settings.DEFAULT_PAGE_SIZE
+                )
+            )
+            recipes = obj.recipes.all()[:recipes_limit]
         serializer = RecipeFavoritesSerializer(
             recipes,
             read_only=True,
@@ -205,7 +299,3 @@ class SubscriptionsSerializer(ExtendedUserSerializer):
             context=self.context
         )
         return serializer.data
-
-    def get_recipes_count(self, obj):
-        """Считает количество рецептов пользователя."""
-        return obj.recipes.count()
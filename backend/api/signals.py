@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.counters import change_counter, counters_changed
+from recipes.models import Ingredients, Recipes, Tags
+
+from .cache import bump_response_cache_version, ingredients_cache, tags_cache
+from .pagination import bump_count_version
+
+AUTHOR_PROFILE_FIELDS = {
+    'email', 'username', 'first_name', 'last_name', 'avatar'
+}
+
+
+@receiver((post_save, post_delete), sender=Tags)
+def invalidate_tags_cache(sender, **kwargs):
+    """Сбрасывает кеш тегов при их изменении."""
+    tags_cache.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Ingredients)
+def invalidate_ingredients_cache(sender, **kwargs):
+    """Сбрасывает кеш ингредиентов при их изменении."""
+    ingredients_cache.invalidate()
+
+
+@receiver(post_save, sender=Recipes)
+def invalidate_recipes_count_on_create(sender, created, **kwargs):
+    """Сбрасывает кеш количества рецептов при создании рецепта."""
+    if created:
+        bump_count_version()
+
+
+@receiver(post_delete, sender=Recipes)
+def invalidate_recipes_count_on_delete(sender, **kwargs):
+    """Сбрасывает кеш количества рецептов при удалении рецепта."""
+    bump_count_version()
+
+
+@receiver((post_save, post_delete), sender=Recipes)
+@receiver((post_save, post_delete), sender=Tags)
+@receiver((post_save, post_delete), sender=Ingredients)
+def invalidate_recipes_responses(sender, **kwargs):
+    """
+    Сбрасывает кеш ответов о рецептах для гостей. Версия повышается
+    после коммита, иначе параллельный запрос мог бы сохранить
+    под новой версией еще старые данные.
+    """
+    transaction.on_commit(bump_response_cache_version)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_recipes_responses_on_profile_change(
+    sender, created, update_fields=None, **kwargs
+):
+    """
+    Сбрасывает кеш ответов о рецептах при изменении данных автора.
+    Регистрация, вход и смена пароля на ответы не влияют.
+    """
+    if created or update_fields and not (
+        set(update_fields) & AUTHOR_PROFILE_FIELDS
+    ):
+        return
+    transaction.on_commit(bump_response_cache_version)
+
+
+@receiver(counters_changed)
+def invalidate_recipes_responses_on_counters_change(sender, **kwargs):
+    """
+    Сбрасывает кеш ответов о рецептах при изменении счетчиков
+    избранного, списков покупок, рецептов и подписчиков: они входят
+    в ответы для гостей, а меняются UPDATE-запросами без сигналов
+    моделей.
+    """
+    transaction.on_commit(bump_response_cache_version)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def release_user_counters(sender, instance, **kwargs):
+    """
+    Уменьшает счетчики рецептов и авторов перед каскадным удалением
+    избранного, списков покупок и подписок пользователя.
+    """
+    change_counter(
+        Recipes.objects.filter(favorites_recipes__user=instance),
+        'favorites_count',
+        -1
+    )
+    change_counter(
+        Recipes.objects.filter(shoppinglist_recipes__user=instance),
+        'shopping_cart_count',
+        -1
+    )
+    change_counter(
+        get_user_model().objects.filter(followers__user=instance),
+        'followers_count',
+        -1
+    )
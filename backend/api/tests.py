@@ -0,0 +1,918 @@
+import sqlite3
+from datetime import datetime, timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.constants import MAX_INGREDIENTS_LIMIT
+from recipes.counters import recount_all
+from recipes.models import (Favorites, Ingredients, Recipes,
+                            RecipesIngredients, ShoppingCartItem, ShoppingList,
+                            Tags)
+from recipes.search import ingredients_index
+from users.models import Subscriptions
+
+from .cache import tags_cache
+from .fields import RenditionsField
+from .renderers import ShoppingCartRenderer, ShoppingCartStreamRenderer
+
+User = get_user_model()
+
+
+def create_user(username):
+    return User.objects.create_user(
+        email=f'{username}@example.com',
+        username=username,
+        password='password',
+        first_name='Имя',
+        last_name='Фамилия',
+    )
+
+
+class RecipesQueriesTest(TestCase):
+    """
+    Число SQL-запросов при чтении рецептов не зависит от размера
+    страницы и количества тегов и ингредиентов в рецептах.
+    """
+    LIST_QUERIES = {'anonymous': 4, 'authenticated': 5}
+    DETAIL_QUERIES = {'anonymous': 3, 'authenticated': 4}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.token = Token.objects.create(user=cls.user)
+        tags = [
+            Tags.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredients.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(10)
+        ]
+        for number in range(4):
+            author = create_user(f'author{number}')
+            if number % 2:
+                Subscriptions.objects.create(user=cls.user, following=author)
+            for recipe_number in range(5):
+                recipe = Recipes.objects.create(
+                    name=f'Рецепт {number}-{recipe_number}',
+                    text='Описание',
+                    cooking_time=10,
+                    author=author,
+                )
+                recipe.tags.set(tags[:recipe_number % 3 + 1])
+                RecipesIngredients.objects.bulk_create(
+                    RecipesIngredients(
+                        recipe=recipe, ingredient=ingredient, amount=10
+                    )
+                    for ingredient in ingredients[:recipe_number + 1]
+                )
+        cls.recipe = Recipes.objects.order_by('pk').last()
+
+    def setUp(self):
+        self.clear_caches()
+        authenticated = APIClient()
+        authenticated.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+        self.clients = {
+            'anonymous': APIClient(),
+            'authenticated': authenticated,
+        }
+
+    @staticmethod
+    def clear_caches():
+        for cache in caches.all():
+            cache.clear()
+
+    def list_queries(self, name):
+        # На PostgreSQL пагинатор сначала читает оценку числа строк.
+        return self.LIST_QUERIES[name] + (connection.vendor == 'postgresql')
+
+    def test_list_queries(self):
+        for name, client in self.clients.items():
+            for limit in (1, 6, 20):
+                with self.subTest(client=name, limit=limit):
+                    self.clear_caches()
+                    with self.assertNumQueries(self.list_queries(name)):
+                        response = client.get(f'/api/recipes/?limit={limit}')
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.json()['results']), limit)
+
+    def test_detail_queries(self):
+        for name, client in self.clients.items():
+            with self.subTest(client=name):
+                with self.assertNumQueries(self.DETAIL_QUERIES[name]):
+                    response = client.get(f'/api/recipes/{self.recipe.pk}/')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['ingredients']), 5)
+
+    def test_author_subscription(self):
+        response = self.clients['authenticated'].get('/api/recipes/?limit=20')
+        for recipe in response.json()['results']:
+            author = User.objects.get(pk=recipe['author']['id'])
+            self.assertEqual(
+                recipe['author']['is_subscribed'],
+                self.user.followings.filter(following=author).exists()
+            )
+
+
+class AnonymousResponseCountersTest(TestCase):
+    """Счетчики в закешированных ответах для гостей не устаревают."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        cls.recipe = Recipes.objects.create(
+            name='Рецепт', text='Описание', cooking_time=10,
+            author=cls.author
+        )
+        recount_all()
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.reader_client = APIClient()
+        self.reader_client.force_authenticate(self.reader)
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+
+    def guest_recipe(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_favorite(self):
+        self.assertEqual(self.guest_recipe()['favorites_count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.reader_client.post(f'{self.url}favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.guest_recipe()['favorites_count'], 1)
+
+    def test_shopping_cart(self):
+        self.assertEqual(self.guest_recipe()['shopping_cart_count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.reader_client.post(f'{self.url}shopping_cart/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.guest_recipe()['shopping_cart_count'], 1)
+
+    def test_subscribe(self):
+        self.assertEqual(self.guest_recipe()['author']['followers_count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.reader_client.post(
+                f'/api/users/{self.author.pk}/subscribe/'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.guest_recipe()['author']['followers_count'], 1)
+
+
+class ShoppingCartItemTest(TestCase):
+    """Суммарный список покупок совпадает со списком рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = create_user('buyer')
+        cls.token = Token.objects.create(user=cls.buyer)
+        cls.authors = [create_user(f'author{number}') for number in range(2)]
+        ingredients = [
+            Ingredients.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+        for author in cls.authors:
+            for number in range(2):
+                recipe = Recipes.objects.create(
+                    name=f'Рецепт {author.username}-{number}',
+                    text='Описание',
+                    cooking_time=10,
+                    author=author,
+                )
+                RecipesIngredients.objects.bulk_create(
+                    RecipesIngredients(
+                        recipe=recipe, ingredient=ingredient, amount=10
+                    )
+                    for ingredient in ingredients[number:]
+                )
+                ShoppingList.objects.create(user=cls.buyer, recipe=recipe)
+        ShoppingCartItem.objects.rebuild()
+        recount_all()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def assertCartConsistent(self):
+        self.assertEqual(
+            dict(
+                ((item.user_id, item.ingredient_id), item.total_amount)
+                for item in ShoppingCartItem.objects.all()
+            ),
+            ShoppingCartItem.objects.expected()
+        )
+
+    def test_recipe_delete(self):
+        recipe = self.authors[0].recipes.first()
+        self.client.force_authenticate(self.authors[0])
+        response = self.client.delete(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertCartConsistent()
+
+    def test_author_delete(self):
+        self.authors[0].delete()
+        self.assertCartConsistent()
+        self.authors[1].delete()
+        self.assertFalse(ShoppingCartItem.objects.exists())
+
+    def test_author_queryset_delete(self):
+        User.objects.filter(pk__in=[author.pk for author in self.authors])\
+            .delete()
+        self.assertFalse(ShoppingCartItem.objects.exists())
+
+
+class IngredientsLimitTest(TestCase):
+    """Параметр limit ограничивает только список ингредиентов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredients = [
+            Ingredients.objects.create(
+                name=f'Мука {number}', measurement_unit='г'
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        ingredients_index.invalidate()
+
+    def test_list_limit(self):
+        response = self.client.get('/api/ingredients/?name=мук&limit=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_retrieve_ignores_limit(self):
+        pk = self.ingredients[0].pk
+        response = self.client.get(f'/api/ingredients/{pk}/?limit=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], pk)
+
+    def test_invalid_limit(self):
+        for limit in ('0', 'abc'):
+            with self.subTest(limit=limit):
+                response = self.client.get(f'/api/ingredients/?limit={limit}')
+                self.assertEqual(response.status_code, 400)
+
+
+class IngredientsSearchTest(TestCase):
+    """
+    Поиск по короткому началу названия отдает не больше limit
+    ингредиентов, даже если совпадений больше, чем SQLite принимает
+    переменных в запросе.
+    """
+    MATCHES = 1500
+    # Лимит переменных в старых сборках SQLite, в новых он больше.
+    SQLITE_MAX_VARIABLES = 999
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredients.objects.bulk_create(
+            Ingredients(name=f'Мука {number:05}', measurement_unit='г')
+            for number in range(cls.MATCHES)
+        )
+        Ingredients.objects.bulk_create(
+            Ingredients(name=name, measurement_unit='г')
+            for name in ('Тростниковый сахар', 'Сахарная мука', 'Сахар')
+        )
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        ingredients_index.invalidate()
+        self.limit_sqlite_variables()
+
+    def limit_sqlite_variables(self):
+        if connection.vendor != 'sqlite':
+            return
+        connection.ensure_connection()
+        database = connection.connection
+        # setlimit есть в sqlite3 с Python 3.11, без него тесты идут
+        # с лимитом сборки.
+        if not hasattr(database, 'setlimit'):
+            return
+        previous = database.setlimit(
+            sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, self.SQLITE_MAX_VARIABLES
+        )
+        self.addCleanup(
+            database.setlimit, sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, previous
+        )
+
+    def names(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.json()]
+
+    def test_short_prefix_with_limit(self):
+        self.assertEqual(
+            self.names('/api/ingredients/?name=м&limit=10'),
+            [f'Мука {number:05}' for number in range(10)]
+        )
+
+    def test_short_prefix_without_limit(self):
+        self.assertEqual(
+            len(self.names('/api/ingredients/?name=м')),
+            MAX_INGREDIENTS_LIMIT
+        )
+
+    def test_prefix_matches_first(self):
+        self.assertEqual(
+            self.names('/api/ingredients/?name=сахар'),
+            ['Сахар', 'Сахарная мука', 'Тростниковый сахар']
+        )
+
+
+class ReferenceDataCacheTest(TestCase):
+    """Заголовки справочных данных после пересборки устаревшего кеша."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tags.objects.create(name='Завтрак', slug='breakfast')
+
+    def setUp(self):
+        tags_cache.invalidate()
+
+    def rebuild(self, **headers):
+        with mock.patch.object(tags_cache, 'ttl', -1):
+            return self.client.get('/api/tags/', **headers)
+
+    def test_unchanged_content_keeps_last_modified(self):
+        response = self.client.get('/api/tags/')
+        rebuilt = self.rebuild(
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(rebuilt.status_code, 304)
+
+    def test_changed_content_moves_last_modified(self):
+        response = self.client.get('/api/tags/')
+        # Изменение из другого процесса: сигналы здесь не срабатывают.
+        Tags.objects.filter(pk=self.tag.pk).update(name='Ранний завтрак')
+        rebuilt = self.rebuild(
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(rebuilt.status_code, 200)
+        self.assertEqual(rebuilt.json()[0]['name'], 'Ранний завтрак')
+        self.assertNotEqual(rebuilt['ETag'], response['ETag'])
+        self.assertNotEqual(
+            rebuilt['Last-Modified'], response['Last-Modified']
+        )
+
+
+class RenditionsFieldTest(TestCase):
+    """Готовность копий изображений не проверяется на каждом чтении."""
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.image = Recipes(image='recipes/images/photo.png').image
+        self.field = RenditionsField(('card', 'detail'))
+
+    def test_ready_checked_once(self):
+        with mock.patch(
+            'recipes.renditions.exists', return_value=True
+        ) as exists:
+            for _ in range(3):
+                urls = self.field.to_representation(self.image)
+        self.assertEqual(exists.call_count, 2)
+        self.assertIn('renditions/card/', urls['card']['webp'])
+
+    def test_pending_falls_back_to_original(self):
+        with mock.patch(
+            'recipes.renditions.exists', return_value=False
+        ) as exists:
+            for _ in range(3):
+                urls = self.field.to_representation(self.image)
+        self.assertEqual(exists.call_count, 2)
+        self.assertEqual(urls['card']['jpeg'], self.image.url)
+
+
+class RecipesTagsFilterTest(TestCase):
+    """
+    Фильтр по нескольким тегам не дублирует рецепты, а страницы не
+    теряют и не повторяют их даже при одинаковых дате и названии.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        tags = [
+            Tags.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)
+        ]
+        for number in range(11):
+            recipe = Recipes.objects.create(
+                name='Рецепт', text='Описание', cooking_time=10,
+                author=author
+            )
+            recipe.tags.set(tags[:number % 3 + 1])
+        Recipes.objects.create(
+            name='Рецепт', text='Описание', cooking_time=10, author=author
+        )
+        Recipes.objects.update(
+            created_at=datetime(2024, 1, 1, tzinfo=timezone.utc)
+        )
+        cls.tagged_ids = set(
+            Recipes.objects.filter(tags__isnull=False).values_list(
+                'pk', flat=True
+            )
+        )
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            ids.extend(recipe['id'] for recipe in data['results'])
+            url = data['next']
+        return ids, data
+
+    def test_page_number_pagination(self):
+        ids, data = self.collect(
+            '/api/recipes/?tags=tag0&tags=tag1&tags=tag2&limit=4'
+        )
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), self.tagged_ids)
+        self.assertEqual(data['count'], len(self.tagged_ids))
+
+    def test_cursor_pagination(self):
+        ids, _ = self.collect(
+            '/api/recipes/?tags=tag0&tags=tag1&tags=tag2&limit=4'
+            '&pagination=cursor'
+        )
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), self.tagged_ids)
+
+
+class RecipesCursorPaginationTest(TestCase):
+    """
+    Курсор хранит все поля порядка ленты: страницы не теряют и не
+    повторяют рецепты с одинаковыми датой и названием, а запросы
+    обходятся без OFFSET.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user('author')
+        Recipes.objects.bulk_create(
+            Recipes(
+                name=f'Рецепт {number % 3}', text='Описание',
+                cooking_time=10, author=author
+            )
+            for number in range(25)
+        )
+        Recipes.objects.update(
+            created_at=datetime(2024, 1, 1, tzinfo=timezone.utc)
+        )
+        recount_all()
+        cls.ids = list(Recipes.objects.values_list('pk', flat=True))
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def page(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in queries:
+            self.assertNotIn('OFFSET', query['sql'].upper())
+        data = response.json()
+        return [recipe['id'] for recipe in data['results']], data
+
+    def test_forward_and_back(self):
+        url = '/api/recipes/?pagination=cursor&limit=4'
+        pages = []
+        while url:
+            ids, data = self.page(url)
+            pages.append(ids)
+            url = data['next']
+        self.assertEqual(sum(pages, []), self.ids)
+        url = data['previous']
+        for expected in reversed(pages[:-1]):
+            ids, data = self.page(url)
+            self.assertEqual(ids, expected)
+            url = data['previous']
+        self.assertIsNone(url)
+
+    def test_invalid_cursor(self):
+        for cursor in ('garbage', 'cD1bIngiXQ=='):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    f'/api/recipes/?pagination=cursor&cursor={cursor}'
+                )
+                self.assertEqual(response.status_code, 404)
+
+
+class SubscriptionsRecipesLimitTest(TestCase):
+    """
+    recipes_limit ограничивает рецепты каждого автора в подписках,
+    а рецепты всех авторов страницы читаются одним запросом.
+    """
+    SUBSCRIPTIONS_QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = create_user('reader')
+        cls.authors = [create_user(f'author{number}') for number in range(3)]
+        for author in cls.authors:
+            Subscriptions.objects.create(user=cls.reader, following=author)
+            for number in range(4):
+                recipe = Recipes.objects.create(
+                    name=f'Рецепт {number}', text='Описание',
+                    cooking_time=10, author=author
+                )
+                Recipes.objects.filter(pk=recipe.pk).update(
+                    created_at=datetime(
+                        2024, 1, number + 1, tzinfo=timezone.utc
+                    )
+                )
+        recount_all()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def get(self, recipes_limit):
+        return self.client.get(
+            f'/api/users/subscriptions/?recipes_limit={recipes_limit}'
+        )
+
+    def test_recipes_limit(self):
+        for recipes_limit in (0, 2, 10):
+            with self.subTest(recipes_limit=recipes_limit):
+                with self.assertNumQueries(self.SUBSCRIPTIONS_QUERIES):
+                    response = self.get(recipes_limit)
+                self.assertEqual(response.status_code, 200)
+                for author in response.json()['results']:
+                    self.assertEqual(
+                        [recipe['name'] for recipe in author['recipes']],
+                        ['Рецепт 3', 'Рецепт 2', 'Рецепт 1', 'Рецепт 0'][
+                            :recipes_limit
+                        ]
+                    )
+                    self.assertEqual(author['recipes_count'], 4)
+
+    def test_invalid_recipes_limit(self):
+        for recipes_limit in ('-1', 'abc'):
+            with self.subTest(recipes_limit=recipes_limit):
+                self.assertEqual(self.get(recipes_limit).status_code, 400)
+
+
+class ShoppingCartPDFCacheTest(TestCase):
+    """PDF списка покупок собирается заново только при изменении списка."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = create_user('buyer')
+        author = create_user('author')
+        ingredient = Ingredients.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+        cls.recipes = []
+        for number in range(2):
+            recipe = Recipes.objects.create(
+                name=f'Рецепт {number}', text='Описание', cooking_time=10,
+                author=author
+            )
+            RecipesIngredients.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=10
+            )
+            cls.recipes.append(recipe)
+        recount_all()
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+        self.client.post(f'/api/recipes/{self.recipes[0].pk}/shopping_cart/')
+
+    def download(self):
+        with mock.patch(
+            'api.views.ShoppingCartPDFRenderer.render_content',
+            autospec=True, return_value=b'%PDF'
+        ) as render:
+            response = self.client.get(
+                '/api/recipes/download_shopping_cart/'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        return render.call_count
+
+    def test_cache_hit(self):
+        self.assertEqual(self.download(), 1)
+        self.assertEqual(self.download(), 0)
+
+    def test_cart_change_invalidates(self):
+        self.assertEqual(self.download(), 1)
+        for method, recipe in (('post', 1), ('delete', 0)):
+            getattr(self.client, method)(
+                f'/api/recipes/{self.recipes[recipe].pk}/shopping_cart/'
+            )
+            self.assertEqual(self.download(), 1)
+            self.assertEqual(self.download(), 0)
+
+    def test_recipe_change_invalidates(self):
+        self.assertEqual(self.download(), 1)
+        Recipes.objects.filter(pk=self.recipes[0].pk).update(
+            updated_at=datetime(2030, 1, 1, tzinfo=timezone.utc)
+        )
+        self.assertEqual(self.download(), 1)
+
+
+class RecipesCountCacheTest(TestCase):
+    """Количество рецептов берется из кеша и сбрасывается при их изменении."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        for number in range(3):
+            Recipes.objects.create(
+                name=f'Рецепт {number}', text='Описание', cooking_time=10,
+                author=cls.author
+            )
+        recount_all()
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def count(self):
+        response = self.client.get('/api/recipes/?limit=1')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['count']
+
+    def test_count_cached(self):
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(self.count(), 3)
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.count(), 3)
+        self.assertEqual(len(second), len(first) - 1)
+
+    def test_create_and_delete_invalidate(self):
+        self.assertEqual(self.count(), 3)
+        recipe = Recipes.objects.create(
+            name='Новый рецепт', text='Описание', cooking_time=10,
+            author=self.author
+        )
+        self.assertEqual(self.count(), 4)
+        response = self.client.delete(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.count(), 3)
+
+
+class RecipeIngredientsUpdateTest(TestCase):
+    """Правка рецепта меняет только отличающиеся строки ингредиентов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.tag = Tags.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredients = [
+            Ingredients.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(4)
+        ]
+        cls.recipe = Recipes.objects.create(
+            name='Рецепт', text='Описание', cooking_time=10,
+            author=cls.author
+        )
+        cls.recipe.tags.set([cls.tag])
+        RecipesIngredients.objects.bulk_create(
+            RecipesIngredients(
+                recipe=cls.recipe, ingredient=ingredient, amount=amount
+            )
+            for ingredient, amount in zip(cls.ingredients, (10, 20, 30))
+        )
+        recount_all()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def rows(self):
+        return {
+            row.ingredient_id: (row.pk, row.amount)
+            for row in self.recipe.recipe_ingredients.all()
+        }
+
+    def test_diff_update(self):
+        before = self.rows()
+        ingredients = [
+            {'id': self.ingredients[0].pk, 'amount': 10},
+            {'id': self.ingredients[1].pk, 'amount': 25},
+            {'id': self.ingredients[3].pk, 'amount': 5},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.pk}/',
+                {'ingredients': ingredients, 'tags': [self.tag.pk]},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        table = RecipesIngredients._meta.db_table
+        writes = [
+            query['sql'].split()[0]
+            for query in queries
+            if table in query['sql']
+            and not query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(sorted(writes), ['DELETE', 'INSERT', 'UPDATE'])
+        after = self.rows()
+        ids = [ingredient.pk for ingredient in self.ingredients]
+        self.assertEqual(after[ids[0]], before[ids[0]])
+        self.assertEqual(after[ids[1]], (before[ids[1]][0], 25))
+        self.assertNotIn(ids[2], after)
+        self.assertEqual(after[ids[3]][1], 5)
+
+
+class GuestUserRecipesFilterTest(TestCase):
+    """Избранное и список покупок гостя пусты."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        author = create_user('author')
+        cls.recipes = [
+            Recipes.objects.create(
+                name=f'Рецепт {number}', text='Описание', cooking_time=10,
+                author=author
+            )
+            for number in range(2)
+        ]
+        Favorites.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingList.objects.create(user=cls.user, recipe=cls.recipes[1])
+        recount_all()
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def ids(self, client, params=''):
+        response = client.get(f'/api/recipes/?{params}')
+        self.assertEqual(response.status_code, 200)
+        return {recipe['id'] for recipe in response.json()['results']}
+
+    def test_guest_flags(self):
+        response = self.client.get('/api/recipes/')
+        for recipe in response.json()['results']:
+            self.assertFalse(recipe['is_favorited'])
+            self.assertFalse(recipe['is_in_shopping_cart'])
+
+    def test_guest_filters(self):
+        all_ids = {recipe.pk for recipe in self.recipes}
+        for param in ('is_favorited', 'is_in_shopping_cart'):
+            with self.subTest(param=param):
+                self.assertEqual(self.ids(self.client, f'{param}=1'), set())
+                self.assertEqual(self.ids(self.client, f'{param}=0'), all_ids)
+
+    def test_user_filters(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        favorite, in_cart = self.recipes
+        self.assertEqual(self.ids(client, 'is_favorited=1'), {favorite.pk})
+        self.assertEqual(self.ids(client, 'is_favorited=0'), {in_cart.pk})
+        self.assertEqual(
+            self.ids(client, 'is_in_shopping_cart=1'), {in_cart.pk}
+        )
+        response = client.get('/api/recipes/?is_favorited=1')
+        recipe = response.json()['results'][0]
+        self.assertTrue(recipe['is_favorited'])
+        self.assertFalse(recipe['is_in_shopping_cart'])
+
+
+class RecipesSearchTest(TestCase):
+    """
+    Поиск ставит совпадения в названии выше совпадений в описании
+    и сочетается с фильтрами по тегам и автору.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = [create_user(f'author{number}') for number in range(2)]
+        soup = Tags.objects.create(name='Суп', slug='soup')
+        salad = Tags.objects.create(name='Салат', slug='salad')
+        cls.recipes = {}
+        for name, text, author, tag in (
+            ('Салат к обеду', 'Подавать вместе с борщом', authors[0], salad),
+            ('Борщ', 'Свекла и капуста', authors[0], soup),
+            ('Зеленый борщ', 'Щавель и яйцо', authors[1], soup),
+            ('Пирог', 'Яблоки и тесто', authors[1], salad),
+        ):
+            recipe = Recipes.objects.create(
+                name=name, text=text, cooking_time=10, author=author
+            )
+            recipe.tags.set([tag])
+            cls.recipes[name] = recipe
+        cls.authors = authors
+        recount_all()
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def names(self, params):
+        response = self.client.get(f'/api/recipes/?{params}')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], len(data['results']))
+        return [recipe['name'] for recipe in data['results']]
+
+    def test_name_matches_first(self):
+        names = self.names('search=борщ')
+        self.assertEqual(sorted(names[:2]), ['Борщ', 'Зеленый борщ'])
+        self.assertEqual(names[2:], ['Салат к обеду'])
+
+    def test_search_with_tags(self):
+        self.assertEqual(
+            self.names('search=борщ&tags=salad'), ['Салат к обеду']
+        )
+        self.assertEqual(
+            sorted(self.names('search=борщ&tags=soup')),
+            ['Борщ', 'Зеленый борщ']
+        )
+
+    def test_search_with_author(self):
+        self.assertEqual(
+            self.names(f'search=борщ&author={self.authors[1].pk}'),
+            ['Зеленый борщ']
+        )
+
+    def test_no_words(self):
+        self.assertEqual(self.names('search=!!!'), [])
+
+
+class ShoppingCartRenderersTest(TestCase):
+    """Список покупок отдается во всех форматах."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = create_user('buyer')
+        ShoppingCartItem.objects.create(
+            user=cls.buyer,
+            ingredient=Ingredients.objects.create(
+                name='Мука', measurement_unit='г'
+            ),
+            total_amount=10
+        )
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def download(self, file_format):
+        response = self.client.get(
+            f'/api/recipes/download_shopping_cart/?format={file_format}'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_formats(self):
+        self.assertIn(
+            'Мука 10 г', b''.join(self.download('txt')).decode()
+        )
+        self.assertEqual(
+            b''.join(self.download('csv')).decode().splitlines(),
+            ['name,measurement_unit,amount', 'Мука,г,10']
+        )
+        self.assertEqual(
+            self.download('json').json(),
+            [{'name': 'Мука', 'measurement_unit': 'г', 'amount': 10}]
+        )
+        self.assertTrue(
+            self.download('pdf').getvalue().startswith(b'%PDF')
+        )
+
+    def test_base_renderers_are_abstract(self):
+        for renderer in (ShoppingCartRenderer, ShoppingCartStreamRenderer):
+            with self.subTest(renderer=renderer.__name__):
+                with self.assertRaises(TypeError):
+                    renderer()
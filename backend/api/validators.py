@@ -1,5 +1,8 @@
 from rest_framework import serializers
 
+from recipes.constants import (MAX_AVAILABLE_INGREDIENTS,
+                               MAX_INGREDIENTS_LIMIT, MAX_RECIPES_LIMIT)
+
 
 def ingredients_validator(value):
     """Валидатор для ингредиентов. Проверяет, что ингредиенты не пустые,
@@ -34,3 +37,64 @@ def tags_validator(value):
             'Теги повторяются'
         )
     return value
+
+
+def recipes_limit_validator(value):
+    """Валидатор для recipes_limit. Проверяет, что значение - целое
+    неотрицательное число, и ограничивает его сверху."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise serializers.ValidationError(
+            {'recipes_limit': 'Значение должно быть целым числом'}
+        )
+    if value < 0:
+        raise serializers.ValidationError(
+            {'recipes_limit': 'Значение не может быть отрицательным'}
+        )
+    return min(value, MAX_RECIPES_LIMIT)
+
+
+def ingredients_limit_validator(value):
+    """Валидатор для limit списка ингредиентов. Проверяет, что значение -
+    целое положительное число, и ограничивает его сверху."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise serializers.ValidationError(
+            {'limit': 'Значение должно быть целым числом'}
+        )
+    if value < 1:
+        raise serializers.ValidationError(
+            {'limit': 'Значение должно быть положительным'}
+        )
+    return min(value, MAX_INGREDIENTS_LIMIT)
+
+
+def available_ingredients_validator(values):
+    """Валидатор для списка имеющихся ингредиентов. Принимает значения
+    параметра ingredients, в каждом может быть несколько id через
+    запятую. Возвращает множество id."""
+    try:
+        ingredient_ids = {
+            int(value)
+            for item in values
+            for value in item.split(',')
+            if value.strip()
+        }
+    except ValueError:
+        raise serializers.ValidationError(
+            {'ingredients': 'Укажите id ингредиентов целыми числами'}
+        )
+    if not ingredient_ids:
+        raise serializers.ValidationError(
+            {'ingredients': 'Укажите хотя бы один ингредиент'}
+        )
+    if len(ingredient_ids) > MAX_AVAILABLE_INGREDIENTS:
+        raise serializers.ValidationError(
+            {'ingredients': (
+                f'Можно указать не больше {MAX_AVAILABLE_INGREDIENTS} '
+                'ингредиентов'
+            )}
+        )
+    return ingredient_ids
@@ -2,39 +2,50 @@ import io
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (BooleanField, F, Prefetch, Value,
+                              prefetch_related_objects)
+from django.http import FileResponse, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 from rest_framework import exceptions, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from recipes.models import Favorites, Ingredients, Recipes, ShoppingList, Tags
+from recipes.counters import change_counter
+from recipes.models import (Favorites, Ingredients, Recipes, ShoppingCartItem,
+                            ShoppingList, Tags)
+from recipes.search import recipes_ingredients_index
+from recipes.utils import shopping_cart_version
 from users.models import Subscriptions
 
+from .cache import (AnonymousResponseCacheMixin, ReferenceDataCacheMixin,
+                    ingredients_cache, tags_cache)
 from .filters import IngredientsFilter, RecipesFilter
-from .pagination import RecipesPagination
+from .pagination import (CookableRecipesPagination, RecipesPagination,
+                         UsersPagination)
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (AvatarSerializer, ExtendedUserSerializer,
-                          IngredientsSerializer, RecipeFavoritesSerializer,
-                          RecipesReadSerializer, RecipesWriteSerializer,
-                          SubscriptionsSerializer, TagsSerialiser)
-
-PDF_START_X = 40
-PDF_START_Y = 800
-PDF_FONT = 'Carlito'
-PDF_FONT_SIZE = 14
-PDF_HEADER_FONT_SIZE = 18
+from .renderers import (ShoppingCartCSVRenderer, ShoppingCartPDFRenderer,
+                        ShoppingCartStreamRenderer, ShoppingCartTextRenderer)
+from .serializers import (AvatarSerializer, CookableRecipesSerializer,
+                          ExtendedUserSerializer, IngredientsSerializer,
+                          RecipeFavoritesSerializer, RecipesReadSerializer,
+                          RecipesWriteSerializer, SubscriptionsSerializer,
+                          TagsSerialiser)
+from .validators import (available_ingredients_validator,
+                         recipes_limit_validator)
+
+SHOPPING_CART_CACHE_TIMEOUT = 60 * 60
 
 User = get_user_model()
 
 
-class IngrediensViewSet(viewsets.ReadOnlyModelViewSet):
+class IngrediensViewSet(ReferenceDataCacheMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Вьюсет для работы с ингредиентами."""
+    reference_cache = ingredients_cache
     permission_classes = (permissions.AllowAny,)
     serializer_class = IngredientsSerializer
     pagination_class = None
@@ -42,16 +53,30 @@ class IngrediensViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientsFilter
     queryset = Ingredients.objects.all()
 
-
-class TagsViewSet(viewsets.ReadOnlyModelViewSet):
+    def filter_queryset(self, queryset):
+        """
+        Ограничивает список параметром limit, поиск по названию - не
+        больше MAX_INGREDIENTS_LIMIT ингредиентами. Срез берется после
+        фильтров и только для списка: get_object фильтрует кварисет
+        дальше, а срез это запрещает.
+        """
+        queryset = super().filter_queryset(queryset)
+        limit = IngredientsFilter.get_limit(self.request.query_params)
+        if self.action != 'list' or limit is None:
+            return queryset
+        return queryset[:limit]
+
+
+class TagsViewSet(ReferenceDataCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для работы с тегами."""
+    reference_cache = tags_cache
     permission_classes = (permissions.AllowAny,)
     queryset = Tags.objects.all()
     serializer_class = TagsSerialiser
     pagination_class = None
 
 
-class RecipesViewSet(viewsets.ModelViewSet):
+class RecipesViewSet(AnonymousResponseCacheMixin, viewsets.ModelViewSet):
     """Вьюсет для работы с рецептами."""
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipesFilter
@@ -61,6 +86,8 @@ class RecipesViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Получаем кварисет с аннотированными полями."""
         user = self.request.user
+        if self.action in ['list', 'retrieve']:
+            return Recipes.objects.with_related(user)
         return Recipes.objects.cart_and_favorites(user)
 
     def get_serializer_class(self):
@@ -69,6 +96,18 @@ class RecipesViewSet(viewsets.ModelViewSet):
             return RecipesWriteSerializer
         return RecipesReadSerializer
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        """
+        Удаляет рецепт и уменьшает счетчик рецептов автора. Списки
+        покупок обновляет сигнал pre_delete.
+        """
+        instance.delete()
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', -1
+        )
+
+    @transaction.atomic
     def add_recipe_to_cart_or_favorites(self, request, model):
         """Добавляет рецепт в список покупок или избранное."""
         recipe = self.get_object()
@@ -78,11 +117,17 @@ class RecipesViewSet(viewsets.ModelViewSet):
         )
         if not created:
             return Response(status=status.HTTP_400_BAD_REQUEST)
+        change_counter(
+            Recipes.objects.filter(pk=recipe.pk), model.counter_field, 1
+        )
+        if model is ShoppingList:
+            ShoppingCartItem.objects.add_recipe([request.user.id], recipe)
         return Response(
             RecipeFavoritesSerializer(recipe).data,
             status=status.HTTP_201_CREATED
         )
 
+    @transaction.atomic
     def delete_recipe_from_cart_or_favorites(self, request, model):
         """Удаляет рецепт из списка покупок или избранного."""
         recipe = self.get_object()
@@ -92,6 +137,15 @@ class RecipesViewSet(viewsets.ModelViewSet):
             .delete()
         )
         if deleted_count > 0:
+            change_counter(
+                Recipes.objects.filter(pk=recipe.pk),
+                model.counter_field,
+                -deleted_count
+            )
+            if model is ShoppingList:
+                ShoppingCartItem.objects.remove_recipe(
+                    [request.user.id], recipe
+                )
             return Response(status=status.HTTP_204_NO_CONTENT)
         else:
             return Response(status=status.HTTP_400_BAD_REQUEST)
@@ -126,52 +180,107 @@ class RecipesViewSet(viewsets.ModelViewSet):
         """Удаляет рецепт из списка покупок."""
         return self.delete_recipe_from_cart_or_favorites(request, ShoppingList)
 
-    def get_pdf(self, ingredients):
-        """Создает PDF-файл со списком покупок."""
-        x = PDF_START_X
-        y = PDF_START_Y
-        font_path = str(
-            settings.BASE_DIR / 'fonts' / 'Carlito-Regular.ttf'
+    def get_pdf(self, user):
+        """
+        Возвращает PDF-файл со списком покупок. Файл кешируется по версии
+        списка покупок, поэтому при неизменном списке не пересобирается.
+        """
+        cache_key = (
+            f'shopping_cart_pdf_{user.id}_{shopping_cart_version(user)}'
         )
-        pdfmetrics.registerFont(TTFont(PDF_FONT, font_path))
-        buffer = io.BytesIO()
-        pdf = canvas.Canvas(buffer)
-        pdf.setTitle('Мой список покупок')
-        pdf.setFont(PDF_FONT, PDF_HEADER_FONT_SIZE)
-        pdf.drawString(x, y, 'Список покупок:')
-        y -= 10  # отступ от заголовка
-        pdf.setFont(PDF_FONT, PDF_FONT_SIZE)
-        for item in ingredients:
-            y -= 20
-            pdf.drawString(
-                x, y,
-                f'- {item["name"]} {item["amount"]} {item["measurement_unit"]}'
+        pdf = cache.get(cache_key)
+        if pdf is None:
+            pdf = ShoppingCartPDFRenderer().render_content(
+                self.get_shopping_cart(user)
             )
-
-        pdf.showPage()
-        pdf.save()
-        buffer.seek(0)
-        return buffer
-
-    @action(detail=False, methods=['get', ], url_path='download_shopping_cart')
-    def download_shopping_cart(self, request):
-        """Создает PDF-файл со списком покупок."""
-        user = request.user
-        ingredients = Ingredients.objects.filter(
-            ingredients_recipe__recipe__shoppinglist_recipes__user=user
-        ).values('name', 'measurement_unit').annotate(
-            amount=Sum('ingredients_recipe__amount')
+            cache.set(cache_key, pdf, SHOPPING_CART_CACHE_TIMEOUT)
+        return pdf
+
+    def get_shopping_cart(self, user):
+        """Возвращает суммированные ингредиенты из списка покупок."""
+        return ShoppingCartItem.objects.filter(user=user).values(
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+            amount=F('total_amount')
         ).order_by('name',)
 
-        response = HttpResponse(
-            self.get_pdf(ingredients),
-            content_type='application/pdf;'
+    @action(
+        detail=False,
+        methods=['get', ],
+        url_path='download_shopping_cart',
+        permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=(
+            ShoppingCartPDFRenderer,
+            ShoppingCartTextRenderer,
+            ShoppingCartCSVRenderer,
+            JSONRenderer,
+        )
+    )
+    def download_shopping_cart(self, request):
+        """
+        Отдает список покупок. Формат выбирается параметром format
+        (pdf, txt, csv, json) или заголовком Accept, по умолчанию PDF.
+        Текст и CSV стримятся прямо из итератора кварисета.
+        """
+        renderer = request.accepted_renderer
+        filename = f'shopping_cart.{renderer.format}'
+        if isinstance(renderer, ShoppingCartPDFRenderer):
+            return FileResponse(
+                io.BytesIO(self.get_pdf(request.user)),
+                as_attachment=True,
+                filename=filename,
+                content_type=renderer.media_type
+            )
+        ingredients = self.get_shopping_cart(request.user)
+        if not isinstance(renderer, ShoppingCartStreamRenderer):
+            return Response(list(ingredients))
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator()),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
         )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.pdf"'
+            f'attachment; filename="{filename}"'
         )
         return response
 
+    @action(
+        detail=False,
+        methods=['get', ],
+        url_path='what_to_cook',
+        pagination_class=CookableRecipesPagination
+    )
+    def what_to_cook(self, request):
+        """
+        Подбирает рецепты по имеющимся ингредиентам (параметр
+        ingredients). Сначала идут рецепты, для которых есть большая
+        доля ингредиентов.
+        """
+        ingredient_ids = available_ingredients_validator(
+            request.query_params.getlist('ingredients')
+        )
+        if settings.RECIPES_INGREDIENTS_INDEX:
+            ranked = recipes_ingredients_index.rank(ingredient_ids)
+        else:
+            ranked = Recipes.objects.by_ingredients(
+                ingredient_ids
+            ).values_list('pk', 'matched', 'total')
+        page = self.paginate_queryset(ranked)
+        recipes = Recipes.objects.with_related(request.user).in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        cookable = []
+        for recipe_id, matched, total in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.coverage = matched / total
+            recipe.missing_count = total - matched
+            cookable.append(recipe)
+        serializer = CookableRecipesSerializer(
+            cookable, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=['get', ], url_path='get-link')
     def get_link(self, request, pk=None):
         """Отдает короткую ссылку на рецепт или создает, если ее нет."""
@@ -185,7 +294,7 @@ class ExtendedUsersViewSet(UserViewSet):
     """Вьюсет для работы с пользователями."""
     serializer_class = ExtendedUserSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
-    pagination_class = RecipesPagination
+    pagination_class = UsersPagination
     queryset = User.objects.all()
 
     def get_permissions(self):
@@ -210,16 +319,16 @@ class ExtendedUsersViewSet(UserViewSet):
     def delete_avatar(self, request):
         """Удаляет аватар пользователя."""
         user = self.request.user
-        user.avatar.delete(save=True)
+        # Файл может использоваться другими объектами, его удалит
+        # команда collect_media_garbage.
+        user.avatar = None
+        user.save(update_fields=('avatar',))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @avatar.mapping.put
     def update_avatar(self, request):
         """Обновляет аватар пользователя."""
         user = self.request.user
-        if user.avatar:
-            user.avatar.delete(save=False)
-
         serializer = AvatarSerializer(
             user,
             data=request.data,
@@ -244,6 +353,7 @@ class ExtendedUsersViewSet(UserViewSet):
         url_path='subscribe',
         permission_classes=(permissions.IsAuthenticated,)
     )
+    @transaction.atomic
     def subscribe(self, request, id=None):
         """Подписка на пользователя."""
         user = request.user
@@ -261,6 +371,10 @@ class ExtendedUsersViewSet(UserViewSet):
         )
         if not created:
             return Response(status=status.HTTP_400_BAD_REQUEST)
+        change_counter(
+            User.objects.filter(pk=subscribe.pk), 'followers_count', 1
+        )
+        subscribe.refresh_from_db(fields=('followers_count',))
 
         return Response(
             SubscriptionsSerializer(
@@ -270,6 +384,7 @@ class ExtendedUsersViewSet(UserViewSet):
         )
 
     @subscribe.mapping.delete
+    @transaction.atomic
     def delete_subscribe(self, request, id=None):
         """Отписка от пользователя."""
         user = request.user
@@ -289,6 +404,11 @@ class ExtendedUsersViewSet(UserViewSet):
             .delete()
         )
         if subscription_count > 0:
+            change_counter(
+                User.objects.filter(pk=subscribe.pk),
+                'followers_count',
+                -subscription_count
+            )
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
@@ -301,8 +421,27 @@ class ExtendedUsersViewSet(UserViewSet):
         """Возвращает список подписок пользователя."""
 
         user = request.user
-        queryset = User.objects.filter(followers__user=user)
+        recipes_limit = recipes_limit_validator(
+            request.query_params.get(
+                'recipes_limit', settings.DEFAULT_PAGE_SIZE
+            )
+        )
+        queryset = User.objects.filter(followers__user=user).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).order_by(*User._meta.ordering)
         page = self.paginate_queryset(queryset)
+        prefetch_related_objects(
+            page,
+            Prefetch(
+                'recipes',
+                queryset=(
+                    Recipes.objects
+                    .filter(author__in=page)
+                    .limited_per_author(recipes_limit)
+                ),
+                to_attr='limited_recipes'
+            )
+        )
         serializer = SubscriptionsSerializer(
             page, many=True, context={'request': request}
         )
@@ -0,0 +1,105 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.http import HttpResponse
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class RequestMetrics:
+    """Счетчики одного запроса: SQL и именованные замеры времени."""
+
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.timings = defaultdict(float)
+        self.active = set()
+
+
+@contextmanager
+def measure(name):
+    """
+    Добавляет время выполнения блока к замеру name текущего запроса.
+    Вложенные блоки с тем же именем повторно не учитываются.
+    """
+    metrics = current_metrics.get()
+    if metrics is None or name in metrics.active:
+        yield
+        return
+    metrics.active.add(name)
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.active.discard(name)
+        metrics.timings[name] += perf_counter() - start
+
+
+class MetricsRegistry:
+    """
+    Накопленные метрики по представлениям в формате Prometheus.
+    Значения хранятся в памяти процесса, каждый воркер отдает свои.
+    """
+    METRICS = (
+        ('requests_total', 'counter', 'Количество запросов.'),
+        ('request_duration_seconds', 'summary', 'Время обработки запроса.'),
+        ('db_queries_total', 'counter', 'Количество SQL-запросов.'),
+        ('db_duration_seconds', 'summary', 'Время выполнения SQL.'),
+        ('serializer_duration_seconds', 'summary', 'Время сериализации.'),
+        ('response_bytes_total', 'counter', 'Размер ответов.'),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(lambda: defaultdict(float))
+
+    def observe(self, metrics, duration, size):
+        with self.lock:
+            stats = self.views[metrics.view]
+            stats['requests_total'] += 1
+            stats['request_duration_seconds'] += duration
+            stats['db_queries_total'] += metrics.queries
+            stats['db_duration_seconds'] += metrics.db_time
+            stats['serializer_duration_seconds'] += (
+                metrics.timings['serializer']
+            )
+            stats['response_bytes_total'] += size
+
+    def render(self):
+        with self.lock:
+            views = {view: dict(stats) for view, stats in self.views.items()}
+        lines = []
+        for name, kind, description in self.METRICS:
+            lines.append(f'# HELP foodgram_{name} {description}')
+            lines.append(f'# TYPE foodgram_{name} {kind}')
+            for view, stats in sorted(views.items()):
+                label = '{view="%s"}' % view.replace('\\', '\\\\').replace(
+                    '"', '\\"'
+                )
+                if kind == 'summary':
+                    lines.append(f'foodgram_{name}_sum{label} {stats[name]}')
+                    lines.append(
+                        f'foodgram_{name}_count{label} '
+                        f'{stats["requests_total"]:.0f}'
+                    )
+                else:
+                    lines.append(f'foodgram_{name}{label} {stats[name]:.0f}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def metrics_view(request):
+    """
+    Отдает метрики для Prometheus. Nginx не проксирует этот адрес,
+    он доступен только из внутренней сети контейнеров.
+    """
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
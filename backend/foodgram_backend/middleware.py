@@ -0,0 +1,108 @@
+import logging
+import os
+import traceback
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import RequestMetrics, current_metrics, registry
+
+logger = logging.getLogger(__name__)
+
+
+def query_origin():
+    """Находит в стеке вызовов ближайшую строку кода проекта."""
+    base = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-1]):
+        if (
+            frame.filename.startswith(base)
+            and 'site-packages' not in frame.filename
+            and frame.filename != __file__
+        ):
+            path = os.path.relpath(frame.filename, base)
+            return f'{path}:{frame.lineno} in {frame.name}'
+    return 'неизвестно'
+
+
+class QueryTimer:
+    """Обертка выполнения SQL, считающая запросы и их время."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - start
+            self.metrics.queries += 1
+            self.metrics.db_time += duration
+            if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+                logger.warning(
+                    'Медленный запрос %.1f мс в %s (%s): %s',
+                    duration * 1000, self.metrics.view, query_origin(), sql
+                )
+
+
+class RequestMetricsMiddleware:
+    """
+    Считает для каждого запроса количество и время SQL, время
+    сериализации и размер ответа. Отдает их в заголовке Server-Timing
+    и накапливает по представлениям для /metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(QueryTimer(metrics))
+                    )
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        duration = perf_counter() - start
+        if metrics.view is None:
+            metrics.view = 'unresolved'
+        registry.observe(metrics, duration, self.response_size(response))
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={metrics.db_time * 1000:.1f};'
+            f'desc="{metrics.queries} queries"',
+            f'serializer;dur={metrics.timings["serializer"] * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Запоминает имя представления и действия вьюсета."""
+        metrics = current_metrics.get()
+        if metrics is None:
+            return
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None:
+            metrics.view = f'{view_func.__module__}.{view_func.__name__}'
+            return
+        action = (getattr(view_func, 'actions', None) or {}).get(
+            request.method.lower()
+        )
+        metrics.view = (
+            f'{view_class.__name__}.{action}' if action
+            else view_class.__name__
+        )
+
+    @staticmethod
+    def response_size(response):
+        if response.has_header('Content-Length'):
+            return int(response['Content-Length'])
+        if response.streaming:
+            return 0
+        return len(response.content)
@@ -9,6 +9,13 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = getenv('SECRET_KEY', get_random_secret_key())
 
+# Ключ перестановки коротких ссылок рецептов. Значение по умолчанию
+# опубликовано в репозитории, по нему порядок ссылок восстанавливается,
+# поэтому в .env нужно задать свое. Менять ключ после появления ссылок
+# нельзя: новые ссылки начнут совпадать с сохраненными, и сохранение
+# рецепта упадет с IntegrityError.
+SHORT_LINK_KEY = getenv('SHORT_LINK_KEY', 'foodgram-short-links')
+
 DEBUG = getenv('DEBUG', 'False') == 'True'
 # DEBUG = True
 
@@ -36,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'foodgram_backend.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -131,6 +139,32 @@ STATIC_ROOT = BASE_DIR.parent / 'backend_static/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR.parent / 'user_media'
 
+IMAGE_RENDITION_WORKERS = int(getenv('IMAGE_RENDITION_WORKERS', '2'))
+
+SLOW_QUERY_THRESHOLD_MS = float(getenv('SLOW_QUERY_THRESHOLD_MS', '200'))
+
+# Индекс ингредиент -> рецепты в памяти каждого воркера. Если памяти
+# мало, подбор рецептов по ингредиентам можно перевести на запросы к базе.
+RECIPES_INGREDIENTS_INDEX = (
+    getenv('RECIPES_INGREDIENTS_INDEX', 'True') == 'True'
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Ответы для гостей. Для общего кеша между воркерами можно указать
+    # файловый бэкенд или Redis, например django_redis.cache.RedisCache.
+    'responses': {
+        'BACKEND': getenv(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': getenv('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(getenv('RESPONSE_CACHE_TIMEOUT', '60')),
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
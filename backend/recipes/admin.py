@@ -1,9 +1,12 @@
 from django.contrib import admin
-from django.db.models import Count
+from django.contrib.auth import get_user_model
 from django.utils.html import format_html
 
+from .counters import change_counter, recipes_counters, recount, users_counters
 from .models import (Favorites, Ingredients, Recipes, RecipesIngredients,
-                     ShoppingList, Tags)
+                     ShoppingCartItem, ShoppingList, Tags)
+
+User = get_user_model()
 
 
 class IngredientsAdminInLine(admin.TabularInline):
@@ -31,19 +34,50 @@ class RecipesAdmin(admin.ModelAdmin):
         'cooking_time', 'tags', 'favorites_recipes_count'
     )
 
-    def get_queryset(self, request):
+    def save_model(self, request, obj, form, change):
+        """
+        Учитывает новый рецепт в счетчике рецептов автора, а при смене
+        автора переносит рецепт в счетчик нового.
+        """
+        super().save_model(request, obj, form, change)
+        if change and 'author' in form.changed_data:
+            change_counter(
+                User.objects.filter(pk=form.initial['author']),
+                'recipes_count',
+                -1
+            )
+        if not change or 'author' in form.changed_data:
+            change_counter(
+                User.objects.filter(pk=obj.author_id), 'recipes_count', 1
+            )
+
+    def save_related(self, request, form, formsets, change):
+        """Пересобирает списки покупок после изменения ингредиентов."""
+        super().save_related(request, form, formsets, change)
+        ShoppingCartItem.objects.rebuild(
+            form.instance.shoppinglist_recipes.values_list('user', flat=True)
+        )
+
+    def delete_queryset(self, request, queryset):
         """
-        Переопределяем метод get_queryset для добавления счетчика
-        избранных рецептов.
+        Пересчитывает счетчики рецептов авторов. Списки покупок
+        обновляет сигнал pre_delete.
         """
-        return Recipes.objects.annotate(
-            favorites_recipes_count=Count('favorites_recipes')
+        author_ids = set(queryset.values_list('author', flat=True))
+        super().delete_queryset(request, queryset)
+        recount(User.objects.filter(pk__in=author_ids), users_counters())
+
+    def delete_model(self, request, obj):
+        """Уменьшает счетчик рецептов автора."""
+        super().delete_model(request, obj)
+        change_counter(
+            User.objects.filter(pk=obj.author_id), 'recipes_count', -1
         )
 
     @admin.display(description='Добавлено в избранное раз:')
     def favorites_recipes_count(self, obj):
         """Возвращает количество добавлений в избранное."""
-        return obj.favorites_recipes_count
+        return obj.favorites_count
 
     @admin.display(description='Фото блюда')
     def preview(self, obj):
@@ -71,5 +105,56 @@ class TagsAdmin(admin.ModelAdmin):
     list_display_links = ('id', 'name', 'slug')
 
 
-admin.site.register(Favorites)
-admin.site.register(ShoppingList)
+class RecipeCountersAdminMixin:
+    """
+    Пересчитывает счетчики затронутых рецептов после правки
+    избранного или списков покупок.
+    """
+
+    def recount_recipes(self, recipe_ids):
+        recount(Recipes.objects.filter(pk__in=recipe_ids), recipes_counters())
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        recipe_ids = [obj.recipe_id]
+        if change and 'recipe' in form.initial:
+            recipe_ids.append(form.initial['recipe'])
+        self.recount_recipes(recipe_ids)
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = list(queryset.values_list('recipe', flat=True))
+        super().delete_queryset(request, queryset)
+        self.recount_recipes(recipe_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.recount_recipes([obj.recipe_id])
+
+
+@admin.register(ShoppingList)
+class ShoppingListAdmin(RecipeCountersAdminMixin, admin.ModelAdmin):
+    """
+    Админка для списков покупок. После изменений пересобирает
+    суммарные списки покупок затронутых пользователей.
+    """
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        user_ids = [obj.user_id]
+        if change and 'user' in form.initial:
+            user_ids.append(form.initial['user'])
+        ShoppingCartItem.objects.rebuild(user_ids)
+
+    def delete_queryset(self, request, queryset):
+        user_ids = list(queryset.values_list('user', flat=True))
+        super().delete_queryset(request, queryset)
+        ShoppingCartItem.objects.rebuild(user_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        ShoppingCartItem.objects.rebuild([obj.user_id])
+
+
+@admin.register(Favorites)
+class FavoritesAdmin(RecipeCountersAdminMixin, admin.ModelAdmin):
+    """Админка для избранного."""
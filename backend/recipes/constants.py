@@ -6,4 +6,46 @@ MAX_INGREDIENT_MEASURE_LENGTH = 64
 MIN_POSITIVE_VALUE = 1
 MAX_POSITIVE_VALUE = 32767
 MAX_LINK_LENGTH = 32
-SHORT_LINK_LENGTH = 6
+SHORT_LINK_LENGTH = 5
+SHORT_LINK_BATCH_SIZE = 1000
+SHORT_LINK_CACHE_SIZE = 10000
+SHORT_LINK_CACHE_MAX_AGE = 60 * 60 * 24 * 30
+MAX_RECIPES_LIMIT = 100
+SHOPPING_CART_BATCH_SIZE = 1000
+INGREDIENTS_INDEX_TTL = 300
+TAGS_INDEX_TTL = 300
+RECIPES_SEARCH_CONFIG = 'russian'
+RECIPES_SEARCH_WEIGHTS = (10.0, 1.0)
+RECIPES_INGREDIENTS_INDEX_TTL = 15 * 60
+MAX_AVAILABLE_INGREDIENTS = 100
+MAX_INGREDIENTS_LIMIT = 100
+IMAGE_RENDITIONS = {
+    'card': (600, 400),
+    'detail': (1200, 800),
+    'avatar': (160, 160),
+}
+IMAGE_RENDITION_FORMATS = {
+    'jpeg': ('JPEG', 'jpg'),
+    'webp': ('WEBP', 'webp'),
+}
+IMAGE_RENDITION_QUALITY = 85
+IMAGE_RENDITIONS_DIR = 'renditions'
+IMAGE_RENDITION_PENDING_TTL = 30
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40_000_000
+IMAGE_UPLOAD_FORMATS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+IMAGE_DECODE_CHUNK_SIZE = 64 * 1024
+IMAGE_SPOOL_MAX_SIZE = 1024 * 1024
+MEDIA_GARBAGE_MIN_AGE = 60 * 60
+RECIPES_EXPORT_CHUNK_SIZE = 2000
+RECIPES_IMPORT_BATCH_SIZE = 1000
+RECIPES_PROGRESS_EVERY = 10000
+INGREDIENTS_IMPORT_BATCH_SIZE = 1000
+IMPORT_READ_SIZE = 64 * 1024
+SYNTHETIC_EMAIL_DOMAIN = 'synthetic.local'
+SYNTHETIC_PASSWORD = 'synthetic-password'
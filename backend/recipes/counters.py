@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+
+# Отправляется после изменения счетчиков UPDATE-запросом: сигналы
+# моделей при этом не срабатывают. Аргумент model - класс моделей.
+counters_changed = Signal()
+
+
+def change_counter(queryset, field, delta):
+    """
+    Атомарно меняет счетчик у строк кварисета выражением
+    field = field + delta, без чтения значения в Python.
+    """
+    if not delta:
+        return 0
+    changed = queryset.update(**{field: F(field) + delta})
+    if changed:
+        counters_changed.send(sender=change_counter, model=queryset.model)
+    return changed
+
+
+def count_related(model, field):
+    """Подзапрос с количеством строк model, ссылающихся на объект."""
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0
+    )
+
+
+def recipes_counters():
+    """Выражения для пересчета счетчиков рецептов."""
+    from .models import Favorites, ShoppingList
+
+    return {
+        'favorites_count': count_related(Favorites, 'recipe'),
+        'shopping_cart_count': count_related(ShoppingList, 'recipe'),
+    }
+
+
+def users_counters():
+    """Выражения для пересчета счетчиков пользователей."""
+    from users.models import Subscriptions
+
+    from .models import Recipes
+
+    return {
+        'recipes_count': count_related(Recipes, 'author'),
+        'followers_count': count_related(Subscriptions, 'following'),
+    }
+
+
+def drifted(queryset, counters):
+    """Оставляет строки, у которых хотя бы один счетчик разошелся."""
+    actual = {f'actual_{field}': expr for field, expr in counters.items()}
+    mismatch = Q()
+    for field in counters:
+        mismatch |= ~Q(**{field: F(f'actual_{field}')})
+    return queryset.annotate(**actual).filter(mismatch)
+
+
+def recount(queryset, counters):
+    """
+    Пересчитывает счетчики одним UPDATE с коррелированными
+    подзапросами. Возвращает количество исправленных строк.
+    """
+    changed = queryset.filter(
+        pk__in=drifted(queryset, counters).values('pk')
+    ).update(**counters)
+    if changed:
+        counters_changed.send(sender=recount, model=queryset.model)
+    return changed
+
+
+def recount_all():
+    """Пересчитывает счетчики всех рецептов и пользователей."""
+    from .models import Recipes
+
+    return (
+        recount(Recipes.objects.all(), recipes_counters()),
+        recount(get_user_model().objects.all(), users_counters()),
+    )
@@ -0,0 +1,377 @@
+import json
+import math
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIClient
+
+from api.pagination import RecipesCursorPagination
+from recipes.counters import count_related
+from recipes.models import (Favorites, Ingredients, Recipes, ShoppingCartItem,
+                            ShoppingList, Tags)
+from users.models import Subscriptions
+
+User = get_user_model()
+
+DEFAULT_BASELINE = settings.BASE_DIR / 'benchmarks' / 'baseline.json'
+PIXEL = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAAD'
+    'UlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=='
+)
+CART_SIZES = (10, 100, 1000)
+CART_FORMATS = ('txt', 'csv', 'json', 'pdf')
+# Перед этими сценариями кеш очищается: замеряется сборка файла,
+# а не чтение готового из кеша.
+UNCACHED_SCENARIOS = ('cart.',)
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    values = sorted(values)
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+class Command(BaseCommand):
+    """Замеряет задержку и число SQL-запросов основных сценариев API."""
+    help = (
+        'Прогоняет основные сценарии API тестовым клиентом на текущей базе '
+        'и выводит p50/p95/p99 и число SQL-запросов по каждому сценарию. '
+        'Все изменения откатываются. Сравнивает результат с базовой линией '
+        'и завершается с ошибкой при регрессии. Базовая линия в репозитории '
+        'снята на seed_synthetic --users 2000 --recipes 20000. Сравнение '
+        'курсорной и постраничной пагинации: seed_synthetic с нужным '
+        'числом рецептов, затем benchmark_api --only recipes.list.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--baseline',
+            default=DEFAULT_BASELINE,
+            help='Файл базовой линии, по умолчанию benchmarks/baseline.json',
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Записать результат как новую базовую линию',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.5,
+            help='Допустимый относительный рост p95',
+        )
+        parser.add_argument(
+            '--min-slack',
+            type=float,
+            default=5.0,
+            help='Рост p95 меньше этого числа миллисекунд не считается '
+                 'регрессией',
+        )
+        parser.add_argument(
+            '--only',
+            nargs='+',
+            default=(),
+            help='Запустить только сценарии с этими префиксами имени',
+        )
+
+    def fixtures(self):
+        """
+        Подбирает пользователя и объекты, на которых идут сценарии.
+        Пользователь - автор с избранным и списком покупок, чтобы фильтры
+        и выгрузка списка не были пустыми, а среди таких - с самыми
+        длинными списками покупок и подписок.
+        """
+        user = User.objects.filter(recipes_count__gt=0).annotate(
+            cart=count_related(ShoppingList, 'user'),
+            favorites=count_related(Favorites, 'user'),
+            followings_count=count_related(Subscriptions, 'user'),
+        ).filter(favorites__gt=0, cart__gt=0).order_by(
+            (F('cart') + F('followings_count')).desc(), 'pk'
+        ).first()
+        recipe = Recipes.objects.filter(author=user).order_by('pk').first()
+        if recipe is None:
+            raise CommandError(
+                'В базе нет данных, сначала выполните seed_synthetic.'
+            )
+        free_recipe = Recipes.objects.exclude(
+            favorites_recipes__user=user
+        ).exclude(shoppinglist_recipes__user=user).order_by('pk').first()
+        author = User.objects.filter(recipes__isnull=False).exclude(
+            followers__user=user
+        ).exclude(pk=user.pk).order_by('pk').first()
+        ingredient = Ingredients.objects.order_by('pk').first()
+        fridge = recipe.recipe_ingredients.values_list(
+            'ingredient', flat=True
+        )
+        recipes_count = Recipes.objects.count()
+        return {
+            'last_page': math.ceil(recipes_count / settings.DEFAULT_PAGE_SIZE),
+            'deep_cursor': self.deep_cursor(recipes_count),
+            **self.cart_users(),
+            'user': user,
+            'recipe': recipe.pk,
+            'free_recipe': (free_recipe or recipe).pk,
+            'author': (author or recipe.author).pk,
+            'tags': list(Tags.objects.values_list('slug', flat=True)[:2]),
+            'tag_ids': list(Tags.objects.values_list('id', flat=True)[:2]),
+            'ingredient': ingredient.pk,
+            'fridge': ','.join(map(str, fridge)),
+            'prefix': ingredient.name[:3].lower(),
+        }
+
+    def deep_cursor(self, recipes_count):
+        """Адрес страницы курсорной пагинации в конце ленты."""
+        recipe = Recipes.objects.only('created_at', 'name')[
+            max(0, recipes_count - settings.DEFAULT_PAGE_SIZE - 1)
+        ]
+        paginator = RecipesCursorPagination()
+        paginator.base_url = '/api/recipes/?pagination=cursor'
+        return paginator.encode_cursor(Cursor(
+            offset=0, reverse=False, position=paginator.get_position(recipe)
+        ))
+
+    def cart_users(self):
+        """
+        Создает пользователей со списками покупок из CART_SIZES строк.
+        Строки пишутся прямо в ShoppingCartItem, без рецептов, чтобы
+        не менять ленту, на которой идут остальные сценарии.
+        """
+        ingredients = list(
+            Ingredients.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        users = {}
+        for size in CART_SIZES:
+            user = User.objects.create_user(
+                email=f'cart{size}@benchmark.local',
+                username=f'benchmark_cart{size}',
+                password=None,
+            )
+            ShoppingCartItem.objects.bulk_create(
+                ShoppingCartItem(
+                    user=user, ingredient_id=pk, total_amount=10
+                )
+                for pk in ingredients[:size]
+            )
+            users[f'cart{size}'] = user
+        return users
+
+    def scenarios(self, data):
+        """
+        Сценарии: имя шага, метод, адрес, авторизация, тело запроса.
+        Авторизация — False для гостя, True для основного пользователя
+        или ключ другого пользователя из fixtures.
+        """
+        tags = '&'.join(f'tags={slug}' for slug in data['tags'])
+        recipe = f"/api/recipes/{data['recipe']}/"
+        free = f"/api/recipes/{data['free_recipe']}/"
+        author = f"/api/users/{data['author']}/"
+        body = {
+            'name': 'Рецепт для замера',
+            'text': 'Текст',
+            'cooking_time': 10,
+            'image': PIXEL,
+            'tags': data['tag_ids'],
+            'ingredients': [{'id': data['ingredient'], 'amount': 10}],
+        }
+        return (
+            (('recipes.list.anon', 'get', '/api/recipes/', False, None),),
+            (('recipes.list', 'get', '/api/recipes/', True, None),),
+            (('recipes.list.tags', 'get', f'/api/recipes/?{tags}', True,
+              None),),
+            (('recipes.list.favorited', 'get',
+              '/api/recipes/?is_favorited=1', True, None),),
+            (('recipes.list.cursor', 'get',
+              '/api/recipes/?pagination=cursor', True, None),),
+            (('recipes.list.last_page', 'get',
+              f"/api/recipes/?page={data['last_page']}", True, None),),
+            (('recipes.list.cursor.deep', 'get', data['deep_cursor'], True,
+              None),),
+            (('recipes.what_to_cook', 'get',
+              f"/api/recipes/what_to_cook/?ingredients={data['fridge']}",
+              True, None),),
+            (('recipes.retrieve', 'get', recipe, True, None),),
+            (('recipes.get_link', 'get', f'{recipe}get-link/', False,
+              None),),
+            (('recipes.create', 'post', '/api/recipes/', True, body),),
+            (('recipes.update', 'patch', recipe, True, body),),
+            (
+                ('recipes.favorite.add', 'post', f'{free}favorite/', True,
+                 None),
+                ('recipes.favorite.remove', 'delete', f'{free}favorite/',
+                 True, None),
+            ),
+            (
+                ('recipes.cart.add', 'post', f'{free}shopping_cart/', True,
+                 None),
+                ('recipes.cart.remove', 'delete', f'{free}shopping_cart/',
+                 True, None),
+            ),
+            (('recipes.download_shopping_cart.pdf', 'get',
+              '/api/recipes/download_shopping_cart/', True, None),),
+            (('recipes.download_shopping_cart.txt', 'get',
+              '/api/recipes/download_shopping_cart/?format=txt', True,
+              None),),
+            *(
+                ((f'cart.{size}.{extension}', 'get',
+                  f'/api/recipes/download_shopping_cart/?format={extension}',
+                  f'cart{size}', None),)
+                for size in CART_SIZES for extension in CART_FORMATS
+            ),
+            (('tags.list', 'get', '/api/tags/', False, None),),
+            (('ingredients.search', 'get',
+              f"/api/ingredients/?name={data['prefix']}", False, None),),
+            (('users.list', 'get', '/api/users/', True, None),),
+            (('users.me', 'get', '/api/users/me/', True, None),),
+            (('users.subscriptions', 'get', '/api/users/subscriptions/',
+              True, None),),
+            (
+                ('users.subscribe', 'post', f'{author}subscribe/', True,
+                 None),
+                ('users.unsubscribe', 'delete', f'{author}subscribe/', True,
+                 None),
+            ),
+        )
+
+    def request(self, client, method, url, body):
+        response = getattr(client, method)(url, body, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{method.upper()} {url}: {response.status_code} '
+                f'{response.content[:200]!r}'
+            )
+
+    def run(self, iterations, warmup, only=()):
+        results = defaultdict(lambda: {'times': [], 'queries': []})
+        data = self.fixtures()
+        clients = {False: APIClient()}
+        users = {True: data['user']}
+        users.update(
+            (f'cart{size}', data[f'cart{size}']) for size in CART_SIZES
+        )
+        for key, user in users.items():
+            token, _ = Token.objects.get_or_create(user=user)
+            clients[key] = APIClient()
+            clients[key].credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        for steps in self.scenarios(data):
+            if only and not any(
+                name.startswith(tuple(only)) for name, *_ in steps
+            ):
+                continue
+            for iteration in range(warmup + iterations):
+                for name, method, url, auth, body in steps:
+                    if name.startswith(UNCACHED_SCENARIOS):
+                        cache.clear()
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        self.request(clients[auth], method, url, body)
+                        elapsed = time.perf_counter() - start
+                    if iteration >= warmup:
+                        results[name]['times'].append(elapsed * 1000)
+                        results[name]['queries'].append(len(queries))
+        return {
+            name: {
+                'p50': round(percentile(result['times'], 50), 2),
+                'p95': round(percentile(result['times'], 95), 2),
+                'p99': round(percentile(result['times'], 99), 2),
+                'queries': max(result['queries']),
+            }
+            for name, result in results.items()
+        }
+
+    def compare(self, results, baseline, tolerance, min_slack):
+        """Возвращает список регрессий относительно базовой линии."""
+        regressions = []
+        for name, result in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if result['queries'] > base['queries']:
+                regressions.append(
+                    f"{name}: SQL-запросов {base['queries']} -> "
+                    f"{result['queries']}"
+                )
+            limit = max(base['p95'] * (1 + tolerance), base['p95'] + min_slack)
+            if result['p95'] > limit:
+                regressions.append(
+                    f"{name}: p95 {base['p95']} -> {result['p95']} мс"
+                )
+        return regressions
+
+    def handle(self, *args, **options):
+        if options['only'] and options['save_baseline']:
+            raise CommandError(
+                'Базовая линия сохраняется только по всем сценариям.'
+            )
+        media = tempfile.mkdtemp()
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        try:
+            with override_settings(MEDIA_ROOT=media, ALLOWED_HOSTS=hosts):
+                with transaction.atomic():
+                    dataset = {
+                        'users': User.objects.count(),
+                        'recipes': Recipes.objects.count(),
+                    }
+                    results = self.run(
+                        options['iterations'], options['warmup'],
+                        options['only']
+                    )
+                    transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(media, ignore_errors=True)
+
+        self.stdout.write(
+            f'{"Сценарий":36} {"p50":>8} {"p95":>8} {"p99":>8} {"SQL":>4}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:36} {result['p50']:8.2f} {result['p95']:8.2f} "
+                f"{result['p99']:8.2f} {result['queries']:4}"
+            )
+        path = options['baseline']
+        if options['save_baseline']:
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(
+                    {'dataset': dataset, 'results': results},
+                    file, ensure_ascii=False, indent=2
+                )
+                file.write('\n')
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовая линия сохранена в {path}.'
+            ))
+            return
+        try:
+            with open(path, encoding='utf-8') as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            self.stdout.write(
+                'Базовой линии нет, запустите команду с --save-baseline.'
+            )
+            return
+        if baseline['dataset'] != dataset:
+            self.stdout.write(self.style.WARNING(
+                f"Базовая линия снята на других данных: {baseline['dataset']}"
+            ))
+        regressions = self.compare(
+            results, baseline['results'],
+            options['tolerance'], options['min_slack']
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
@@ -0,0 +1,106 @@
+import base64
+import io
+import multiprocessing
+import os
+import re
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+from rest_framework import serializers
+
+from api.fields import ImageField
+
+PROC_STATUS = '/proc/self/status'
+PROC_CLEAR_REFS = '/proc/self/clear_refs'
+MB = 1024 * 1024
+
+
+class UploadSerializer(serializers.Serializer):
+    image = ImageField()
+
+
+def read_status(name):
+    """Возвращает значение из /proc/self/status в байтах."""
+    with open(PROC_STATUS) as file:
+        match = re.search(rf'^{name}:\s+(\d+) kB', file.read(), re.MULTILINE)
+    return int(match.group(1)) * 1024
+
+
+def reset_peak_rss():
+    """Сбрасывает пиковый RSS процесса до текущего значения."""
+    with open(PROC_CLEAR_REFS, 'w') as file:
+        file.write('5')
+
+
+def make_payload(size):
+    """Data URL с несжатым PNG из шума примерно заданного размера."""
+    side = int((size / 3) ** 0.5)
+    buffer = io.BytesIO()
+    Image.frombytes(
+        'RGB', (side, side), os.urandom(side * side * 3)
+    ).save(buffer, 'PNG', compress_level=0)
+    return (
+        'data:image/png;base64,'
+        + base64.b64encode(buffer.getvalue()).decode()
+    )
+
+
+def measure(size, results):
+    """
+    Замеряет в отдельном процессе, на сколько вырастает RSS при проверке
+    изображения сериализатором. Пик сбрасывается после подготовки
+    данных, поэтому в замер попадает только сама загрузка.
+    """
+    payload = make_payload(size)
+    serializer = UploadSerializer(
+        data={'image': payload},
+        context={'request': SimpleNamespace(user=SimpleNamespace(id=1))}
+    )
+    reset_peak_rss()
+    before = read_status('VmRSS')
+    if serializer.is_valid():
+        result = 'принято'
+        serializer.validated_data['image'].close()
+    else:
+        result = str(serializer.errors['image'][0])
+    results.put((len(payload), read_status('VmHWM') - before, result))
+
+
+class Command(BaseCommand):
+    """Замеряет пиковую память при загрузке изображений в base64."""
+    help = (
+        'Для каждого размера изображения в отдельном процессе проверяет '
+        'data URL полем ImageField и выводит прирост пикового RSS. '
+        'Работает только на Linux: пик сбрасывается через '
+        '/proc/self/clear_refs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=(1, 5, 20),
+            help='Размеры изображений в мегабайтах',
+        )
+
+    def handle(self, *args, **options):
+        if not os.access(PROC_CLEAR_REFS, os.W_OK):
+            raise CommandError(f'Нет доступа к {PROC_CLEAR_REFS}.')
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(
+            f'{"Изображение":>12} {"Data URL":>10} {"Пик RSS":>10}  Результат'
+        )
+        for size in options['sizes']:
+            results = context.Queue()
+            process = context.Process(
+                target=measure, args=(size * MB, results)
+            )
+            process.start()
+            payload, peak, result = results.get()
+            process.join()
+            self.stdout.write(
+                f'{size:>9} МБ {payload / MB:>7.1f} МБ '
+                f'{peak / MB:>7.1f} МБ  {result}'
+            )
@@ -0,0 +1,79 @@
+import os
+import time
+from itertools import product
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from recipes.constants import (IMAGE_RENDITION_FORMATS, IMAGE_RENDITIONS,
+                               MEDIA_GARBAGE_MIN_AGE)
+from recipes.models import Recipes
+from recipes.renditions import rendition_name
+
+
+class Command(BaseCommand):
+    """Удаляет файлы из MEDIA_ROOT, на которые не ссылается ни один объект."""
+    help = (
+        'Удаляет неиспользуемые изображения и их уменьшенные копии '
+        'из MEDIA_ROOT. Недавно созданные файлы не трогает.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать файлы, которые будут удалены',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=MEDIA_GARBAGE_MIN_AGE,
+            help='Не удалять файлы моложе указанного числа секунд',
+        )
+
+    def referenced_files(self):
+        """Собирает пути к используемым файлам и их копиям."""
+        names = set()
+        for queryset in (
+            Recipes.objects.values_list('image', flat=True),
+            get_user_model().objects.values_list('avatar', flat=True),
+        ):
+            names.update(name for name in queryset.iterator() if name)
+        referenced = set(names)
+        for name, rendition, image_format in product(
+            names, IMAGE_RENDITIONS, IMAGE_RENDITION_FORMATS
+        ):
+            referenced.add(rendition_name(name, rendition, image_format))
+        return {
+            os.path.normpath(os.path.join(settings.MEDIA_ROOT, name))
+            for name in referenced
+        }
+
+    def handle(self, *args, **options):
+        referenced = self.referenced_files()
+        deadline = time.time() - options['min_age']
+        removed = size = 0
+        for root, dirs, files in os.walk(settings.MEDIA_ROOT, topdown=False):
+            for file in files:
+                path = os.path.join(root, file)
+                stat = os.stat(path)
+                if path in referenced or stat.st_mtime > deadline:
+                    continue
+                removed += 1
+                size += stat.st_size
+                if options['dry_run']:
+                    self.stdout.write(path)
+                else:
+                    os.remove(path)
+            if (
+                not options['dry_run']
+                and os.path.normpath(root)
+                != os.path.normpath(settings.MEDIA_ROOT)
+                and not os.listdir(root)
+            ):
+                os.rmdir(root)
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {removed}, {size / 1024 / 1024:.1f} МБ.'
+        ))
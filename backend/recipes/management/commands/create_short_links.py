@@ -1,8 +1,9 @@
 from django.core.management.base import BaseCommand
 from django.db.models import Q
 
+from recipes.constants import SHORT_LINK_BATCH_SIZE
 from recipes.models import Recipes
-from recipes.utils import unique_link
+from recipes.utils import encode_short_link
 
 
 class Command(BaseCommand):
@@ -13,10 +14,22 @@ class Command(BaseCommand):
         recipes = Recipes.objects.filter(
             Q(short_link__isnull=True)
             | Q(short_link='')
-        )
-        for recipe in recipes:
-            recipe.short_link = unique_link()
-            recipe.save(update_fields=['short_link'])
+        ).only('id').order_by('pk')
+        updated = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                recipes.filter(pk__gt=last_pk)[:SHORT_LINK_BATCH_SIZE]
+            )
+            if not batch:
+                break
+            for recipe in batch:
+                recipe.short_link = encode_short_link(recipe.pk)
+            Recipes.objects.bulk_update(batch, ['short_link'])
+            updated += len(batch)
+            last_pk = batch[-1].pk
         self.stdout.write(
-            self.style.SUCCESS('Отсутствующие короткие cсылки добавлены.')
+            self.style.SUCCESS(
+                f'Отсутствующие короткие cсылки добавлены: {updated}.'
+            )
         )
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import EmptyResultSet
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import BooleanField, Value
+from django.test import RequestFactory
+
+from api.filters import IngredientsFilter, RecipesFilter
+from api.views import RecipesViewSet
+from recipes.models import Ingredients, Recipes, Tags
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Выводит планы выполнения основных запросов API."""
+    help = (
+        'Выполняет EXPLAIN для основного запроса каждого эндпоинта API, '
+        'чтобы проверить использование индексов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='id пользователя, от имени которого строятся запросы',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Выполнить EXPLAIN ANALYZE (только PostgreSQL)',
+        )
+
+    def get_user(self, user_id):
+        if user_id is None:
+            return User.objects.order_by('id').first() or AnonymousUser()
+        try:
+            return User.objects.get(pk=user_id)
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {user_id} не найден')
+
+    def get_queries(self, user):
+        """Возвращает основные запросы эндпоинтов API."""
+        page_size = settings.DEFAULT_PAGE_SIZE
+        recipes = Recipes.objects.with_related(user)
+        recipe = Recipes.objects.order_by('id').first()
+        author = recipe.author_id if recipe else 0
+        tag = Tags.objects.order_by('id').first()
+        ingredient = Ingredients.objects.order_by('id').first()
+        queries = {
+            'GET /api/recipes/': recipes[:page_size],
+            'GET /api/recipes/?author=': (
+                RecipesFilter({'author': author}, queryset=recipes)
+                .qs[:page_size]
+            ),
+            'GET /api/recipes/{id}/': recipes.filter(
+                pk=recipe.pk if recipe else 0
+            ),
+            'GET /api/ingredients/?name=': IngredientsFilter(
+                {'name': ingredient.name[:3] if ingredient else 'мол'},
+                queryset=Ingredients.objects.all()
+            ).qs,
+            'GET /s/{short_link}/': Recipes.objects.filter(
+                short_link=recipe.short_link if recipe else ''
+            ),
+        }
+        if tag is not None:
+            queries['GET /api/recipes/?tags='] = RecipesFilter(
+                {'tags': [tag.slug]}, queryset=recipes
+            ).qs[:page_size]
+        if user.is_authenticated:
+            request = RequestFactory().get('/api/recipes/')
+            request.user = user
+            queries['GET /api/recipes/?is_favorited=1'] = RecipesFilter(
+                {'is_favorited': 'true'}, queryset=recipes, request=request
+            ).qs[:page_size]
+            queries['GET /api/recipes/?is_in_shopping_cart=1'] = (
+                RecipesFilter(
+                    {'is_in_shopping_cart': 'true'},
+                    queryset=recipes,
+                    request=request
+                ).qs[:page_size]
+            )
+            queries['GET /api/recipes/download_shopping_cart/'] = (
+                RecipesViewSet().get_shopping_cart(user)
+            )
+            followings = User.objects.filter(followers__user=user)
+            queries['GET /api/users/subscriptions/'] = followings.annotate(
+                is_subscribed=Value(True, output_field=BooleanField())
+            ).order_by(*User._meta.ordering)[:page_size]
+            queries['GET /api/users/subscriptions/ (recipes)'] = (
+                Recipes.objects
+                .filter(author__in=followings[:page_size])
+                .limited_per_author(page_size)
+            )
+        return queries
+
+    def handle(self, *args, **options):
+        if options['analyze'] and connection.vendor != 'postgresql':
+            raise CommandError('--analyze поддерживается только PostgreSQL')
+        user = self.get_user(options['user'])
+        self.stdout.write(
+            f'База данных: {connection.vendor}, пользователь: {user}'
+        )
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        for name, queryset in self.get_queries(user).items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            try:
+                self.stdout.write(queryset.explain(**explain_options))
+            except EmptyResultSet:
+                self.stdout.write('Запрос не выполняется: пустой результат')
+            self.stdout.write('')
@@ -0,0 +1,101 @@
+import json
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from recipes.constants import RECIPES_EXPORT_CHUNK_SIZE, RECIPES_PROGRESS_EVERY
+from recipes.models import Recipes, RecipesIngredients
+
+
+class Command(BaseCommand):
+    """Выгружает рецепты в NDJSON, по одному рецепту на строку."""
+    help = (
+        'Выгружает рецепты с тегами и ингредиентами в формате NDJSON. '
+        'Читает базу частями, не загружая каталог в память целиком.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл для выгрузки, "-" для стандартного вывода',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=RECIPES_EXPORT_CHUNK_SIZE,
+            help='Количество рецептов, читаемых из базы за раз',
+        )
+
+    def related(self, recipe_ids):
+        """Загружает теги и ингредиенты для части рецептов."""
+        tags, ingredients = {}, {}
+        for recipe_id, name, slug in Recipes.tags.through.objects.filter(
+            recipes_id__in=recipe_ids
+        ).values_list('recipes_id', 'tags__name', 'tags__slug'):
+            tags.setdefault(recipe_id, []).append(
+                {'name': name, 'slug': slug}
+            )
+        for recipe_id, name, unit, amount in (
+            RecipesIngredients.objects.filter(recipe_id__in=recipe_ids)
+            .order_by('pk')
+            .values_list(
+                'recipe_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'amount'
+            )
+        ):
+            ingredients.setdefault(recipe_id, []).append(
+                {'name': name, 'measurement_unit': unit, 'amount': amount}
+            )
+        return tags, ingredients
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        to_stdout = options['path'] == '-'
+        log = self.stderr if to_stdout else self.stdout
+        recipes = Recipes.objects.order_by('pk').values(
+            'pk', 'name', 'text', 'image', 'cooking_time',
+            'author__email', 'created_at'
+        ).iterator(chunk_size=chunk_size)
+        file = (
+            sys.stdout if to_stdout
+            else open(options['path'], 'w', encoding='utf-8')
+        )
+        exported = 0
+        start = time.monotonic()
+        try:
+            while True:
+                chunk = list(islice(recipes, chunk_size))
+                if not chunk:
+                    break
+                tags, ingredients = self.related(
+                    [recipe['pk'] for recipe in chunk]
+                )
+                for recipe in chunk:
+                    pk = recipe.pop('pk')
+                    recipe['author'] = recipe.pop('author__email')
+                    recipe['created_at'] = recipe['created_at'].isoformat()
+                    recipe['tags'] = tags.get(pk, [])
+                    recipe['ingredients'] = ingredients.get(pk, [])
+                    file.write(json.dumps(recipe, ensure_ascii=False))
+                    file.write('\n')
+                previous = exported
+                exported += len(chunk)
+                if (
+                    exported // RECIPES_PROGRESS_EVERY
+                    > previous // RECIPES_PROGRESS_EVERY
+                ):
+                    rate = exported / (time.monotonic() - start)
+                    log.write(
+                        f'Выгружено рецептов: {exported}, '
+                        f'{rate:.0f} в секунду'
+                    )
+        finally:
+            if not to_stdout:
+                file.close()
+        elapsed = time.monotonic() - start
+        log.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {exported} за {elapsed:.1f} с, '
+            f'{exported / elapsed if elapsed else 0:.0f} в секунду.'
+        ))
@@ -1,32 +1,145 @@
+import csv
 import json
+import re
+from itertools import islice
+from pathlib import Path
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
+from recipes.constants import (IMPORT_READ_SIZE, INGREDIENTS_IMPORT_BATCH_SIZE,
+                               MAX_INGREDIENT_MEASURE_LENGTH,
+                               MAX_INGREDIENT_NAME_LENGTH)
 from recipes.models import Ingredients
 
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def read_json_array(file):
+    """
+    Читает элементы JSON-массива по одному, не загружая файл целиком.
+    В памяти держится только непрочитанный остаток буфера.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(IMPORT_READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидался JSON-массив.')
+    position, eof = 1, False
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            end = None
+        # Элемент в самом конце буфера может быть обрезан.
+        if end is None or end == len(buffer) and not eof:
+            if eof:
+                raise CommandError('Файл оборван или содержит ошибку.')
+            chunk = file.read(IMPORT_READ_SIZE)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item
+        position = end
+
+
+def read_csv(file):
+    """Читает строки CSV вида «название,единица» с заголовком или без."""
+    for row in csv.reader(file):
+        if row[:2] == ['name', 'measurement_unit']:
+            continue
+        if len(row) >= 2:
+            yield {'name': row[0], 'measurement_unit': row[1]}
+
 
 class Command(BaseCommand):
     """Импорт ингредиентов из файла"""
-    help = 'Импорт ингредиентов из файла'
+    help = (
+        'Импорт ингредиентов из файла JSON или CSV. Файл читается потоком, '
+        'уже существующие ингредиенты пропускаются, поэтому команду '
+        'можно запускать повторно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=settings.BASE_DIR / 'data' / 'ingredients.json',
+            help='Путь к файлу, по умолчанию data/ingredients.json',
+        )
+        parser.add_argument(
+            '--format',
+            choices=('json', 'csv'),
+            help='Формат файла, по умолчанию определяется по расширению',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=INGREDIENTS_IMPORT_BATCH_SIZE,
+            help='Количество ингредиентов в одном запросе',
+        )
+
+    def import_batch(self, items):
+        """
+        Сохраняет новые ингредиенты пакета.
+        Возвращает количество добавленных и пропущенных.
+        """
+        keys = {
+            (item['name'].strip(), item['measurement_unit'].strip())
+            for item in items
+        }
+        existing = set(
+            Ingredients.objects.filter(
+                name__in={name for name, _ in keys}
+            ).values_list('name', 'measurement_unit')
+        )
+        new = keys - existing
+        # ignore_conflicts защищает от параллельного импорта тех же строк.
+        Ingredients.objects.bulk_create(
+            (Ingredients(name=name, measurement_unit=unit)
+             for name, unit in new),
+            ignore_conflicts=True
+        )
+        return len(new), len(items) - len(new)
+
+    def is_valid(self, item):
+        """Проверяет, что запись можно сохранить без ошибок базы."""
+        if not isinstance(item, dict):
+            return False
+        name, unit = item.get('name'), item.get('measurement_unit')
+        return (
+            isinstance(name, str) and isinstance(unit, str)
+            and 0 < len(name.strip()) <= MAX_INGREDIENT_NAME_LENGTH
+            and 0 < len(unit.strip()) <= MAX_INGREDIENT_MEASURE_LENGTH
+        )
 
     def handle(self, *args, **options):
-        """Импортирует ингредиенты из файла ingredients.json"""
-        path = settings.BASE_DIR / 'data' / 'ingredients.json'
-        with open(path, encoding='utf-8') as file:
-            ingredients = json.load(file)
-
-            ingredients_list = []
-            for ingredient in ingredients:
-                ingredients_list.append(
-                    Ingredients(
-                        name=ingredient['name'],
-                        measurement_unit=ingredient['measurement_unit']
-                    )
-                )
-            Ingredients.objects.bulk_create(
-                ingredients_list,
-                ignore_conflicts=True
+        """Импортирует ингредиенты из файла."""
+        path = Path(options['path'])
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        readers = {'json': read_json_array, 'csv': read_csv}
+        if file_format not in readers:
+            raise CommandError(
+                'Не удалось определить формат файла, укажите --format.'
             )
+        inserted = skipped = invalid = 0
+        with open(path, encoding='utf-8', newline='') as file:
+            items = readers[file_format](file)
+            while True:
+                batch = list(islice(items, options['batch_size']))
+                if not batch:
+                    break
+                valid = [item for item in batch if self.is_valid(item)]
+                invalid += len(batch) - len(valid)
+                if valid:
+                    added, existed = self.import_batch(valid)
+                    inserted += added
+                    skipped += existed
 
-        self.stdout.write(self.style.SUCCESS('Ингредиенты импортированы'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Ингредиенты импортированы: добавлено {inserted}, '
+            f'пропущено существующих и повторов {skipped}, '
+            f'некорректных {invalid}.'
+        ))
@@ -0,0 +1,180 @@
+import json
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes.constants import RECIPES_IMPORT_BATCH_SIZE, RECIPES_PROGRESS_EVERY
+from recipes.counters import recount, users_counters
+from recipes.models import Ingredients, Recipes, RecipesIngredients, Tags
+
+
+class Command(BaseCommand):
+    """Загружает рецепты из NDJSON, созданного командой export_recipes."""
+    help = (
+        'Загружает рецепты из файла NDJSON пакетами. Недостающие теги '
+        'и ингредиенты создаются, рецепты неизвестных авторов пропускаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='Файл для загрузки, "-" для стандартного ввода',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=RECIPES_IMPORT_BATCH_SIZE,
+            help='Количество рецептов, сохраняемых за один запрос',
+        )
+
+    def add_missing_tags(self, records):
+        """Создает теги, которых еще нет в базе, и добавляет их в словарь."""
+        missing = {
+            tag['slug']: tag['name']
+            for record in records for tag in record['tags']
+            if tag['slug'] not in self.tags
+        }
+        if not missing:
+            return
+        Tags.objects.bulk_create(
+            (Tags(slug=slug, name=name) for slug, name in missing.items()),
+            ignore_conflicts=True
+        )
+        self.tags.update(
+            Tags.objects.filter(slug__in=missing).values_list('slug', 'id')
+        )
+
+    def add_missing_ingredients(self, records):
+        """Создает ингредиенты, которых еще нет в базе."""
+        missing = {
+            (item['name'], item['measurement_unit'])
+            for record in records for item in record['ingredients']
+        } - self.ingredients.keys()
+        if not missing:
+            return
+        Ingredients.objects.bulk_create(
+            (
+                Ingredients(name=name, measurement_unit=unit)
+                for name, unit in missing
+            ),
+            ignore_conflicts=True
+        )
+        for name, unit, pk in Ingredients.objects.filter(
+            name__in={name for name, _ in missing}
+        ).values_list('name', 'measurement_unit', 'id'):
+            self.ingredients[name, unit] = pk
+
+    @transaction.atomic
+    def import_batch(self, records):
+        """Сохраняет пакет рецептов. Возвращает число сохраненных."""
+        records = [
+            record for record in records if record['author'] in self.authors
+        ]
+        if not records:
+            return 0
+        self.add_missing_tags(records)
+        self.add_missing_ingredients(records)
+        recipes = Recipes.objects.bulk_insert([
+            Recipes(
+                name=record['name'],
+                text=record['text'],
+                image=record.get('image') or None,
+                cooking_time=record['cooking_time'],
+                author_id=self.authors[record['author']],
+                created_at=(
+                    parse_datetime(record['created_at'])
+                    if record.get('created_at') else None
+                ),
+            )
+            for record in records
+        ])
+        tags, ingredients = [], []
+        for recipe, record in zip(recipes, records):
+            tags.extend(
+                Recipes.tags.through(
+                    recipes_id=recipe.pk, tags_id=self.tags[tag['slug']]
+                )
+                for tag in record['tags'] if tag['slug'] in self.tags
+            )
+            amounts = {}
+            for item in record['ingredients']:
+                key = item['name'], item['measurement_unit']
+                amounts[key] = amounts.get(key, 0) + item['amount']
+            ingredients.extend(
+                RecipesIngredients(
+                    recipe_id=recipe.pk,
+                    ingredient_id=self.ingredients[key],
+                    amount=amount
+                )
+                for key, amount in amounts.items()
+            )
+        Recipes.tags.through.objects.bulk_create(tags, ignore_conflicts=True)
+        RecipesIngredients.objects.bulk_create(ingredients)
+        return len(recipes)
+
+    def read(self, file):
+        """Читает файл построчно, пропуская пустые строки."""
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as error:
+                raise CommandError(f'Строка {number}: {error}')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        self.authors = dict(
+            get_user_model().objects.values_list('email', 'id')
+        )
+        self.tags = dict(Tags.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, unit): pk
+            for name, unit, pk in Ingredients.objects.values_list(
+                'name', 'measurement_unit', 'id'
+            )
+        }
+        file = (
+            sys.stdin if options['path'] == '-'
+            else open(options['path'], encoding='utf-8')
+        )
+        read = imported = 0
+        start = time.monotonic()
+        try:
+            batch = []
+            for record in self.read(file):
+                batch.append(record)
+                if len(batch) < batch_size:
+                    continue
+                previous = read
+                read += len(batch)
+                imported += self.import_batch(batch)
+                batch = []
+                if (
+                    read // RECIPES_PROGRESS_EVERY
+                    > previous // RECIPES_PROGRESS_EVERY
+                ):
+                    self.stdout.write(
+                        f'Загружено рецептов: {imported}, '
+                        f'{read / (time.monotonic() - start):.0f} в секунду'
+                    )
+            read += len(batch)
+            imported += self.import_batch(batch)
+        except (KeyError, TypeError) as error:
+            raise CommandError(
+                f'Некорректная запись рецепта после {read}-й: {error!r}'
+            )
+        finally:
+            if file is not sys.stdin:
+                file.close()
+        recount(get_user_model().objects.all(), users_counters())
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {imported} из {read} за {elapsed:.1f} с, '
+            f'{read / elapsed if elapsed else 0:.0f} в секунду. '
+            f'Пропущено из-за неизвестного автора: {read - imported}.'
+        ))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingCartItem
+
+
+class Command(BaseCommand):
+    """Пересобирает или проверяет суммарные списки покупок."""
+    help = (
+        'Пересобирает таблицу суммарных списков покупок. '
+        'С ключом --verify только сверяет ее с исходными данными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Проверить таблицу без изменений',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            ShoppingCartItem.objects.rebuild()
+            self.stdout.write(
+                self.style.SUCCESS('Списки покупок пересобраны.')
+            )
+            return
+        expected = ShoppingCartItem.objects.expected()
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingCartItem.objects.values_list(
+                'user', 'ingredient', 'total_amount'
+            ).iterator()
+        }
+        mismatches = {
+            key for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        }
+        if mismatches:
+            raise CommandError(
+                f'Расхождений в списках покупок: {len(mismatches)}. '
+                'Запустите команду без --verify.'
+            )
+        self.stdout.write(self.style.SUCCESS('Списки покупок корректны.'))
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.counters import drifted, recipes_counters, recount, users_counters
+from recipes.models import Recipes
+
+
+class Command(BaseCommand):
+    """Пересчитывает или проверяет денормализованные счетчики."""
+    help = (
+        'Пересчитывает счетчики избранного и списков покупок у рецептов, '
+        'рецептов и подписчиков у пользователей. С ключом --verify только '
+        'сверяет их с исходными данными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Проверить счетчики без изменений',
+        )
+
+    def handle(self, *args, **options):
+        targets = (
+            ('рецептов', Recipes.objects.all(), recipes_counters()),
+            (
+                'пользователей',
+                get_user_model().objects.all(),
+                users_counters()
+            ),
+        )
+        if not options['verify']:
+            for label, queryset, counters in targets:
+                fixed = recount(queryset, counters)
+                self.stdout.write(f'Исправлено {label}: {fixed}')
+            self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны.'))
+            return
+        mismatches = {
+            label: drifted(queryset, counters).count()
+            for label, queryset, counters in targets
+        }
+        if any(mismatches.values()):
+            details = ', '.join(
+                f'{label}: {count}' for label, count in mismatches.items()
+            )
+            raise CommandError(
+                f'Расхождения в счетчиках ({details}). '
+                'Запустите команду без --verify.'
+            )
+        self.stdout.write(self.style.SUCCESS('Счетчики корректны.'))
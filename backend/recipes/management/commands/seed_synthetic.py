@@ -0,0 +1,229 @@
+import math
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.constants import (MAX_POSITIVE_VALUE, RECIPES_IMPORT_BATCH_SIZE,
+                               SYNTHETIC_EMAIL_DOMAIN, SYNTHETIC_PASSWORD)
+from recipes.counters import recount_all
+from recipes.models import (Favorites, Ingredients, Recipes,
+                            RecipesIngredients, ShoppingCartItem, ShoppingList,
+                            Tags)
+from users.models import Subscriptions
+
+User = get_user_model()
+
+DEFAULT_TAGS = (('Завтрак', 'breakfast'), ('Обед', 'lunch'),
+                ('Ужин', 'dinner'))
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+AMOUNTS = (1, 2, 3, 5, 10, 50, 100, 150, 200, 250, 500, 1000)
+
+
+def zipf_weights(size, exponent=1.0):
+    """Накопленные веса закона Ципфа: первые элементы популярнее."""
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(size)))
+
+
+class Command(BaseCommand):
+    """Заполняет базу синтетическими данными для нагрузочных тестов."""
+    help = (
+        'Создает синтетических пользователей, рецепты, подписки, избранное '
+        'и списки покупок с правдоподобными распределениями. '
+        f'Пароль всех пользователей: {SYNTHETIC_PASSWORD}.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=2000,
+            help='Минимальное количество ингредиентов в базе',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Начальное значение генератора для воспроизводимости',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Удалить ранее созданных синтетических пользователей',
+        )
+
+    def log(self, message):
+        self.stdout.write(
+            f'[{time.monotonic() - self.start:6.1f} с] {message}'
+        )
+
+    def ensure_reference_data(self, count):
+        """Создает теги и ингредиенты, если их не хватает."""
+        if not Tags.objects.exists():
+            Tags.objects.bulk_create(
+                Tags(name=name, slug=slug) for name, slug in DEFAULT_TAGS
+            )
+        missing = count - Ingredients.objects.count()
+        if missing > 0:
+            Ingredients.objects.bulk_create(
+                (
+                    Ingredients(
+                        name=f'Синтетический ингредиент {number}',
+                        measurement_unit=self.random.choice(UNITS)
+                    )
+                    for number in range(missing)
+                ),
+                batch_size=RECIPES_IMPORT_BATCH_SIZE,
+                ignore_conflicts=True
+            )
+        # Порядок задает популярность ингредиентов в рецептах.
+        ingredients = list(Ingredients.objects.values_list('id', flat=True))
+        self.random.shuffle(ingredients)
+        return list(Tags.objects.values_list('id', flat=True)), ingredients
+
+    def create_users(self, count):
+        first = User.objects.filter(
+            email__endswith=f'@{SYNTHETIC_EMAIL_DOMAIN}'
+        ).count()
+        password = make_password(SYNTHETIC_PASSWORD)
+        users = User.objects.bulk_create(
+            (
+                User(
+                    email=f'user{number}@{SYNTHETIC_EMAIL_DOMAIN}',
+                    username=f'synthetic{number}',
+                    first_name='Синтетический',
+                    last_name=f'Пользователь {number}',
+                    password=password,
+                )
+                for number in range(first, first + count)
+            ),
+            batch_size=RECIPES_IMPORT_BATCH_SIZE
+        )
+        return list(User.objects.filter(
+            email__in=[user.email for user in users]
+        ).values_list('id', flat=True))
+
+    def sample(self, population, cum_weights, count):
+        """Выбирает count разных элементов с учетом весов."""
+        count = min(count, len(population))
+        chosen = set()
+        while len(chosen) < count:
+            chosen.update(self.random.choices(
+                population, cum_weights=cum_weights, k=count - len(chosen)
+            ))
+        return chosen
+
+    def create_recipes(self, authors, count, tags, ingredients):
+        """
+        Создает рецепты пакетами. Число рецептов у автора распределено
+        по Парето, число ингредиентов в рецепте — логнормально.
+        """
+        author_weights = list(accumulate(
+            self.random.paretovariate(1.2) for _ in authors
+        ))
+        ingredient_weights = zipf_weights(len(ingredients))
+        now = timezone.now()
+        recipe_ids = []
+        for offset in range(0, count, RECIPES_IMPORT_BATCH_SIZE):
+            size = min(RECIPES_IMPORT_BATCH_SIZE, count - offset)
+            with transaction.atomic():
+                recipes = Recipes.objects.bulk_insert([
+                    Recipes(
+                        name=f'Синтетический рецепт {offset + number}',
+                        text='Смешать ингредиенты и готовить до готовности.',
+                        cooking_time=min(MAX_POSITIVE_VALUE, max(1, round(
+                            self.random.lognormvariate(math.log(40), 0.6)
+                        ))),
+                        author_id=author,
+                        created_at=now - timedelta(
+                            seconds=self.random.randrange(365 * 24 * 3600)
+                        ),
+                    )
+                    for number, author in enumerate(self.random.choices(
+                        authors, cum_weights=author_weights, k=size
+                    ))
+                ])
+                recipe_tags, recipe_ingredients = [], []
+                for recipe in recipes:
+                    recipe_tags.extend(
+                        Recipes.tags.through(
+                            recipes_id=recipe.pk, tags_id=tag
+                        )
+                        for tag in self.random.sample(
+                            tags, self.random.randint(1, min(3, len(tags)))
+                        )
+                    )
+                    ingredients_count = max(1, min(30, round(
+                        self.random.lognormvariate(math.log(8), 0.35)
+                    )))
+                    recipe_ingredients.extend(
+                        RecipesIngredients(
+                            recipe_id=recipe.pk,
+                            ingredient_id=ingredient,
+                            amount=self.random.choice(AMOUNTS)
+                        )
+                        for ingredient in self.sample(
+                            ingredients, ingredient_weights, ingredients_count
+                        )
+                    )
+                Recipes.tags.through.objects.bulk_create(recipe_tags)
+                RecipesIngredients.objects.bulk_create(recipe_ingredients)
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+            self.log(f'Рецептов: {len(recipe_ids)} из {count}')
+        return recipe_ids
+
+    def create_relations(self, model, field, users, targets, mean):
+        """
+        Связывает пользователей с целями: количество связей у пользователя
+        распределено экспоненциально, популярность целей — по Ципфу.
+        """
+        weights = zipf_weights(len(targets))
+        relations = []
+        for user in users:
+            count = int(self.random.expovariate(1 / mean))
+            relations.extend(
+                model(user_id=user, **{f'{field}_id': target})
+                for target in self.sample(targets, weights, count)
+                if target != user
+            )
+            if len(relations) >= RECIPES_IMPORT_BATCH_SIZE:
+                model.objects.bulk_create(relations, ignore_conflicts=True)
+                relations = []
+        model.objects.bulk_create(relations, ignore_conflicts=True)
+
+    def handle(self, *args, **options):
+        self.start = time.monotonic()
+        self.random = random.Random(options['seed'])
+        if options['clear']:
+            deleted, _ = User.objects.filter(
+                email__endswith=f'@{SYNTHETIC_EMAIL_DOMAIN}'
+            ).delete()
+            self.log(f'Удалено объектов: {deleted}')
+        tags, ingredients = self.ensure_reference_data(options['ingredients'])
+        users = self.create_users(options['users'])
+        self.log(f'Пользователей: {len(users)}')
+        if not users:
+            return
+        authors = self.random.sample(users, max(1, len(users) // 5))
+        recipes = self.create_recipes(
+            authors, options['recipes'], tags, ingredients
+        )
+        if recipes:
+            popular = recipes[:]
+            self.random.shuffle(popular)
+            self.create_relations(Favorites, 'recipe', users, popular, 10)
+            buyers = self.random.sample(users, len(users) * 3 // 10)
+            self.create_relations(ShoppingList, 'recipe', buyers, popular, 4)
+            ShoppingCartItem.objects.rebuild(buyers)
+            self.log('Избранное и списки покупок созданы')
+        self.create_relations(Subscriptions, 'following', users, authors, 5)
+        recount_all()
+        self.log(self.style.SUCCESS('Синтетические данные созданы.'))
@@ -1,5 +1,15 @@
-from django.db import models
-from django.db.models import BooleanField, Exists, OuterRef, Value
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, transaction
+from django.db.models import (BooleanField, Count, Exists, F, FloatField,
+                              OuterRef, Prefetch, Q, Sum, Value, Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, RowNumber
+from django.utils import timezone
+
+from .constants import SHOPPING_CART_BATCH_SIZE
 
 
 class RecipesQuerySet(models.QuerySet):
@@ -22,3 +32,272 @@ class RecipesQuerySet(models.QuerySet):
             is_favorited=Value(False, output_field=BooleanField()),
             is_in_shopping_cart=Value(False, output_field=BooleanField())
         )
+
+    def with_related(self, user):
+        """
+        Кварисет для чтения рецептов: подгружает автора, теги и ингредиенты
+        фиксированным числом запросов и аннотирует подписку на автора.
+        """
+        from users.models import Subscriptions
+
+        from .models import RecipesIngredients, Tags
+
+        if user.is_authenticated:
+            author_is_subscribed = Exists(
+                Subscriptions.objects.filter(
+                    user=user, following=OuterRef('author')
+                )
+            )
+        else:
+            author_is_subscribed = Value(False, output_field=BooleanField())
+        return (
+            self.cart_and_favorites(user)
+            .annotate(author_is_subscribed=author_is_subscribed)
+            .select_related('author')
+            .prefetch_related(
+                Prefetch('tags', queryset=Tags.objects.all()),
+                Prefetch(
+                    'recipe_ingredients',
+                    queryset=(
+                        RecipesIngredients.objects
+                        .select_related('ingredient')
+                    )
+                ),
+            )
+        )
+
+    def limited_per_author(self, limit):
+        """
+        Оставляет не больше limit последних рецептов каждого автора.
+        Нумерует рецепты оконной функцией ROW_NUMBER() OVER
+        (PARTITION BY author_id), поэтому выборка для всех авторов
+        делается одним запросом.
+        """
+        ranked = self.order_by().annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=F('author'),
+                order_by=[F('created_at').desc(), F('name').asc()],
+            )
+        ).values('pk', 'row_number')
+        try:
+            sql, params = ranked.query.sql_with_params()
+        except EmptyResultSet:
+            return self.none()
+        pk_column = self.model._meta.pk.column
+        return self.model.objects.filter(
+            pk__in=RawSQL(
+                f'SELECT {pk_column} FROM ({sql}) AS ranked '
+                'WHERE row_number <= %s',
+                (*params, limit)
+            )
+        )
+
+    def by_ingredients(self, ingredient_ids):
+        """
+        Рецепты, в которых есть хотя бы один из ингредиентов, с числом
+        совпадений matched, числом ингредиентов total и долей coverage.
+        Порядок тот же, что у индекса в памяти: доля, совпадения, новизна.
+        Запасной вариант для RecipesIngredientsIndex.
+        """
+        from .models import RecipesIngredients
+
+        return (
+            self.filter(pk__in=RecipesIngredients.objects.filter(
+                ingredient__in=ingredient_ids
+            ).values('recipe'))
+            .annotate(
+                matched=Count(
+                    'recipe_ingredients__ingredient',
+                    filter=Q(
+                        recipe_ingredients__ingredient__in=ingredient_ids
+                    ),
+                    distinct=True
+                ),
+                total=Count('recipe_ingredients__ingredient', distinct=True),
+            )
+            .annotate(coverage=Cast('matched', FloatField()) / F('total'))
+            .order_by('-coverage', '-matched', '-pk')
+        )
+
+    def bulk_insert(self, recipes):
+        """
+        Массово создает рецепты с первичными ключами и короткими ссылками.
+        Заданная у рецепта дата создания сохраняется, хотя auto_now_add
+        перезаписывает ее при вставке.
+
+        Короткая ссылка зависит от первичного ключа, которого до вставки
+        нет. Временное уникальное значение позволяет найти созданные
+        строки и на бэкендах, не возвращающих ключи из bulk_create.
+        Ссылки и даты записываются одним executemany: bulk_update строит
+        CASE на каждую строку и на больших пакетах медленнее самой вставки.
+        """
+        from .utils import encode_short_link
+
+        now = timezone.now()
+        created = [recipe.created_at or now for recipe in recipes]
+        for recipe in recipes:
+            recipe.short_link = uuid4().hex
+        self.bulk_create(recipes)
+        ids = dict(self.filter(
+            short_link__in=[recipe.short_link for recipe in recipes]
+        ).values_list('short_link', 'id'))
+        for recipe, created_at in zip(recipes, created):
+            recipe.pk = ids[recipe.short_link]
+            recipe.short_link = encode_short_link(recipe.pk)
+            recipe.created_at = created_at
+        opts = self.model._meta
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        short_link = opts.get_field('short_link')
+        created_at = opts.get_field('created_at')
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {quote(opts.db_table)} '
+                f'SET {quote(short_link.column)} = %s, '
+                f'{quote(created_at.column)} = %s '
+                f'WHERE {quote(opts.pk.column)} = %s',
+                [
+                    (
+                        recipe.short_link,
+                        created_at.get_db_prep_save(
+                            recipe.created_at, connection
+                        ),
+                        recipe.pk,
+                    )
+                    for recipe in recipes
+                ]
+            )
+        return recipes
+
+
+class ShoppingCartItemQuerySet(models.QuerySet):
+    """
+    Кварисет для суммарных ингредиентов списков покупок.
+    Поддерживает таблицу в актуальном состоянии при изменении
+    списков покупок и рецептов.
+    """
+    def recipe_amounts(self, recipe):
+        """Возвращает количество каждого ингредиента рецепта."""
+        from .models import RecipesIngredients
+
+        return dict(
+            RecipesIngredients.objects
+            .filter(recipe=recipe)
+            .order_by()
+            .values('ingredient')
+            .annotate(amount=Sum('amount'))
+            .values_list('ingredient', 'amount')
+        )
+
+    @transaction.atomic
+    def change_amounts(self, user_ids, amounts):
+        """
+        Прибавляет к спискам покупок пользователей количество ингредиентов
+        из словаря {id ингредиента: изменение количества}. Строки
+        с нулевым количеством удаляются.
+        """
+        amounts = {
+            ingredient: amount
+            for ingredient, amount in amounts.items() if amount
+        }
+        if not amounts:
+            return
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        # Блокировка пользователей упорядочивает параллельные изменения
+        # одного списка: иначе обе транзакции не найдут строку
+        # ингредиента и попытаются ее создать.
+        list(
+            get_user_model().objects
+            .select_for_update()
+            .filter(pk__in=user_ids)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        items = {
+            (item.user_id, item.ingredient_id): item
+            for item in self.select_for_update().filter(
+                user__in=user_ids, ingredient__in=amounts
+            )
+        }
+        to_create, to_update, to_delete = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, amount in amounts.items():
+                item = items.get((user_id, ingredient_id))
+                if item is None:
+                    if amount > 0:
+                        to_create.append(self.model(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            total_amount=amount
+                        ))
+                    continue
+                item.total_amount += amount
+                if item.total_amount > 0:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.pk)
+        self.bulk_create(to_create)
+        self.bulk_update(to_update, ['total_amount'])
+        self.filter(pk__in=to_delete).delete()
+
+    def add_recipe(self, user_ids, recipe):
+        """Добавляет ингредиенты рецепта в списки покупок."""
+        self.change_amounts(user_ids, self.recipe_amounts(recipe))
+
+    def remove_recipe(self, user_ids, recipe):
+        """Убирает ингредиенты рецепта из списков покупок."""
+        self.change_amounts(
+            user_ids,
+            {
+                ingredient: -amount
+                for ingredient, amount in self.recipe_amounts(recipe).items()
+            }
+        )
+
+    def expected(self, user_ids=None):
+        """
+        Считает списки покупок по таблице ShoppingList. Возвращает
+        словарь {(id пользователя, id ингредиента): количество}.
+        """
+        from .models import ShoppingList
+
+        carts = ShoppingList.objects.all()
+        if user_ids is not None:
+            carts = carts.filter(user__in=user_ids)
+        rows = (
+            carts
+            .order_by()
+            .values('user', 'recipe__recipe_ingredients__ingredient')
+            .annotate(amount=Sum('recipe__recipe_ingredients__amount'))
+            .values_list(
+                'user', 'recipe__recipe_ingredients__ingredient', 'amount'
+            )
+        )
+        return {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in rows
+            if ingredient_id is not None
+        }
+
+    @transaction.atomic
+    def rebuild(self, user_ids=None):
+        """Пересобирает списки покупок пользователей с нуля."""
+        items = self.all()
+        if user_ids is not None:
+            items = items.filter(user__in=user_ids)
+        items.delete()
+        self.bulk_create(
+            (
+                self.model(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    total_amount=amount
+                )
+                for (user_id, ingredient_id), amount
+                in self.expected(user_ids).items()
+            ),
+            batch_size=SHOPPING_CART_BATCH_SIZE
+        )
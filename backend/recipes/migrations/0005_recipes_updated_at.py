@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_auto_20250704_1042'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+from django.db.models import Sum
+
+
+def fill_shopping_cart_items(apps, schema_editor):
+    """Заполняет суммарные списки покупок по существующим данным."""
+    ShoppingList = apps.get_model('recipes', 'ShoppingList')
+    ShoppingCartItem = apps.get_model('recipes', 'ShoppingCartItem')
+    rows = (
+        ShoppingList.objects
+        .order_by()
+        .values('user', 'recipe__recipe_ingredients__ingredient')
+        .annotate(amount=Sum('recipe__recipe_ingredients__amount'))
+        .values_list(
+            'user', 'recipe__recipe_ingredients__ingredient', 'amount'
+        )
+    )
+    ShoppingCartItem.objects.bulk_create(
+        (
+            ShoppingCartItem(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=amount
+            )
+            for user_id, ingredient_id, amount in rows
+            if ingredient_id is not None
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_shoppingcartitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            fill_shopping_cart_items, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+CREATE_INDEXES = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredients_name_trgm '
+    'ON recipes_ingredients USING gin (LOWER(name) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredients_name_prefix '
+    'ON recipes_ingredients (LOWER(name) text_pattern_ops)',
+)
+
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS recipes_ingredients_name_trgm',
+    'DROP INDEX IF EXISTS recipes_ingredients_name_prefix',
+)
+
+
+def run_on_postgres(statements):
+    """Выполняет SQL только на PostgreSQL, на других базах ничего не делает."""
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_fill_shoppingcartitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgres(CREATE_INDEXES),
+            run_on_postgres(DROP_INDEXES)
+        ),
+    ]
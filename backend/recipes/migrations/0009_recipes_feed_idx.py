@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_ingredients_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipes',
+            index=models.Index(fields=['-created_at', 'name', 'id'], name='recipes_feed_idx'),
+        ),
+    ]
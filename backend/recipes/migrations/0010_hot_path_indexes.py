@@ -0,0 +1,29 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipes_feed_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorites',
+            index=models.Index(fields=['user', 'recipe'], name='favorites_user_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipes',
+            index=models.Index(fields=['author', '-created_at'], name='recipes_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipesingredients',
+            index=models.Index(fields=['recipe', 'ingredient'], name='recipe_ingredient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppinglist',
+            index=models.Index(fields=['user', 'recipe'], name='shoppinglist_user_recipe_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0
+    )
+
+
+def fill_engagement_counters(apps, schema_editor):
+    """Заполняет счетчики избранного и списков покупок рецептов."""
+    Recipes = apps.get_model('recipes', 'Recipes')
+    Favorites = apps.get_model('recipes', 'Favorites')
+    ShoppingList = apps.get_model('recipes', 'ShoppingList')
+    Recipes.objects.update(
+        favorites_count=count_related(Favorites, 'recipe'),
+        shopping_cart_count=count_related(ShoppingList, 'recipe')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_engagement_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            fill_engagement_counters, migrations.RunPython.noop
+        ),
+    ]
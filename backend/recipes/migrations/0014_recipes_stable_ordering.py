@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-18 07:13
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_fill_engagement_counters'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipes',
+            options={'ordering': ['-created_at', 'name', 'id'], 'verbose_name': 'Рецепт', 'verbose_name_plural': 'рецепты'},
+        ),
+    ]
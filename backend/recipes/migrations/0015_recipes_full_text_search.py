@@ -0,0 +1,71 @@
+from django.db import migrations
+
+POSTGRES_CREATE = (
+    "ALTER TABLE recipes_recipes ADD COLUMN IF NOT EXISTS search_vector "
+    "tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('russian'::regconfig, coalesce(name, '')), 'A')"
+    " || "
+    "setweight(to_tsvector('russian'::regconfig, coalesce(text, '')), 'B')"
+    ") STORED",
+    'CREATE INDEX IF NOT EXISTS recipes_search_vector_gin '
+    'ON recipes_recipes USING gin (search_vector)',
+)
+
+POSTGRES_DROP = (
+    'DROP INDEX IF EXISTS recipes_search_vector_gin',
+    'ALTER TABLE recipes_recipes DROP COLUMN IF EXISTS search_vector',
+)
+
+SQLITE_CREATE = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipes_fts USING fts5('
+    "name, text, content='recipes_recipes', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    'CREATE TRIGGER IF NOT EXISTS recipes_recipes_fts_insert '
+    'AFTER INSERT ON recipes_recipes BEGIN '
+    'INSERT INTO recipes_recipes_fts(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    'CREATE TRIGGER IF NOT EXISTS recipes_recipes_fts_delete '
+    'AFTER DELETE ON recipes_recipes BEGIN '
+    'INSERT INTO recipes_recipes_fts(recipes_recipes_fts, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); END",
+    'CREATE TRIGGER IF NOT EXISTS recipes_recipes_fts_update '
+    'AFTER UPDATE OF name, text ON recipes_recipes BEGIN '
+    'INSERT INTO recipes_recipes_fts(recipes_recipes_fts, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); "
+    'INSERT INTO recipes_recipes_fts(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    "INSERT INTO recipes_recipes_fts(recipes_recipes_fts) VALUES ('rebuild')",
+)
+
+SQLITE_DROP = (
+    'DROP TRIGGER IF EXISTS recipes_recipes_fts_insert',
+    'DROP TRIGGER IF EXISTS recipes_recipes_fts_delete',
+    'DROP TRIGGER IF EXISTS recipes_recipes_fts_update',
+    'DROP TABLE IF EXISTS recipes_recipes_fts',
+)
+
+
+def run_on_vendor(postgres, sqlite):
+    """Выполняет SQL для текущей базы, на остальных базах ничего не делает."""
+    def run(apps, schema_editor):
+        statements = {
+            'postgresql': postgres,
+            'sqlite': sqlite,
+        }.get(schema_editor.connection.vendor, ())
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipes_stable_ordering'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_vendor(POSTGRES_CREATE, SQLITE_CREATE),
+            run_on_vendor(POSTGRES_DROP, SQLITE_DROP)
+        ),
+    ]
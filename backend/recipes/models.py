@@ -7,8 +7,9 @@ from .constants import (MAX_INGREDIENT_MEASURE_LENGTH,
                         MAX_INGREDIENT_NAME_LENGTH, MAX_LINK_LENGTH,
                         MAX_POSITIVE_VALUE, MAX_RECIPE_LENGTH, MAX_TAG_LENGTH,
                         MIN_POSITIVE_VALUE, SHORT_STRING)
-from .managers import RecipesQuerySet
-from .utils import unique_link
+from .managers import RecipesQuerySet, ShoppingCartItemQuerySet
+from .storage import hashed_storage
+from .utils import encode_short_link
 
 
 class Tags(models.Model):
@@ -57,6 +58,7 @@ class Recipes(models.Model):
     image = models.ImageField(
         'Фото блюда',
         upload_to='images/',
+        storage=hashed_storage,
         blank=True,
         null=True,
         default=None
@@ -91,17 +93,44 @@ class Recipes(models.Model):
         'Дата создания',
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        'Добавлений в список покупок',
+        default=0,
+        editable=False
+    )
     objects = RecipesQuerySet.as_manager()
 
     def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
         if not self.short_link:
-            self.short_link = unique_link()
-        return super().save(*args, **kwargs)
+            self.short_link = encode_short_link(self.pk)
+            Recipes.objects.filter(pk=self.pk).update(
+                short_link=self.short_link
+            )
 
     class Meta:
-        ordering = ['-created_at', 'name']
+        ordering = ['-created_at', 'name', 'id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'рецепты'
+        indexes = [
+            models.Index(
+                fields=['-created_at', 'name', 'id'],
+                name='recipes_feed_idx'
+            ),
+            models.Index(
+                fields=['author', '-created_at'],
+                name='recipes_author_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return Truncator(self.name).chars(SHORT_STRING)
@@ -130,6 +159,12 @@ class RecipesIngredients(models.Model):
         ordering = ['recipe', 'ingredient']
         verbose_name = 'Ингредиент рецепта'
         verbose_name_plural = 'Ингредиенты рецептов'
+        indexes = [
+            models.Index(
+                fields=['recipe', 'ingredient'],
+                name='recipe_ingredient_idx'
+            ),
+        ]
 
 
 class BaseCartFavoritesRecipeModel(models.Model):
@@ -154,10 +189,17 @@ class BaseCartFavoritesRecipeModel(models.Model):
                 name='unique_%(class)s_user_recipe'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['user', 'recipe'],
+                name='%(class)s_user_recipe_idx'
+            ),
+        ]
 
 
 class Favorites(BaseCartFavoritesRecipeModel):
     """Модель для избранных рецептов пользователя."""
+    counter_field = 'favorites_count'
 
     class Meta(BaseCartFavoritesRecipeModel.Meta):
         verbose_name = 'Избранное'
@@ -166,7 +208,40 @@ class Favorites(BaseCartFavoritesRecipeModel):
 
 class ShoppingList(BaseCartFavoritesRecipeModel):
     """Модель для списка покупок пользователя."""
+    counter_field = 'shopping_cart_count'
 
     class Meta(BaseCartFavoritesRecipeModel.Meta):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+
+
+class ShoppingCartItem(models.Model):
+    """
+    Модель для суммарного количества ингредиента в списке покупок
+    пользователя. Обновляется при изменении списка покупок и рецептов.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_items',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredients,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_items',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField('Количество')
+    objects = ShoppingCartItemQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['user', 'ingredient']
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_cart_item'
+            )
+        ]
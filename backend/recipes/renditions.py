@@ -0,0 +1,118 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .constants import (IMAGE_RENDITION_FORMATS, IMAGE_RENDITION_PENDING_TTL,
+                        IMAGE_RENDITION_QUALITY, IMAGE_RENDITIONS,
+                        IMAGE_RENDITIONS_DIR)
+
+logger = logging.getLogger(__name__)
+
+executor = None
+
+
+def get_executor():
+    """Создает пул потоков для обработки изображений при первом вызове."""
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_RENDITION_WORKERS,
+            thread_name_prefix='renditions'
+        )
+    return executor
+
+
+def rendition_name(name, rendition, image_format):
+    """Возвращает путь к уменьшенной копии изображения в хранилище."""
+    stem = posixpath.splitext(name)[0]
+    extension = IMAGE_RENDITION_FORMATS[image_format][1]
+    return posixpath.join(
+        IMAGE_RENDITIONS_DIR, rendition, f'{stem}.{extension}'
+    )
+
+
+def exists(name, rendition, storage=default_storage):
+    """
+    Проверяет копию в хранилище. WebP записывается последним,
+    поэтому его наличие означает, что готовы все форматы.
+    """
+    return storage.exists(rendition_name(name, rendition, 'webp'))
+
+
+def ready_cache_key(name, rendition):
+    return f'rendition_ready:{rendition}:{name}'
+
+
+def is_ready(name, rendition, storage=default_storage):
+    """
+    Проверяет, готова ли копия, без обращения к хранилищу на каждом
+    чтении. Имя файла меняется вместе с содержимым, поэтому готовность
+    кешируется навсегда, а отсутствие копии - на
+    IMAGE_RENDITION_PENDING_TTL секунд.
+    """
+    key = ready_cache_key(name, rendition)
+    ready = cache.get(key)
+    if ready is None:
+        ready = exists(name, rendition, storage)
+        cache.set(key, ready, None if ready else IMAGE_RENDITION_PENDING_TTL)
+    return ready
+
+
+def make_renditions(name, renditions, storage=default_storage):
+    """Создает уменьшенные копии изображения во всех форматах."""
+    with storage.open(name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+    image = image.convert('RGB')
+    for rendition in renditions:
+        if exists(name, rendition, storage):
+            cache.set(ready_cache_key(name, rendition), True, None)
+            continue
+        resized = image.copy()
+        resized.thumbnail(IMAGE_RENDITIONS[rendition], Image.LANCZOS)
+        for image_format in sorted(
+            IMAGE_RENDITION_FORMATS, key=lambda item: item == 'webp'
+        ):
+            path = rendition_name(name, rendition, image_format)
+            buffer = BytesIO()
+            resized.save(
+                buffer,
+                IMAGE_RENDITION_FORMATS[image_format][0],
+                quality=IMAGE_RENDITION_QUALITY
+            )
+            if storage.exists(path):
+                storage.delete(path)
+            storage.save(path, ContentFile(buffer.getvalue()))
+        cache.set(ready_cache_key(name, rendition), True, None)
+
+
+def run_make_renditions(name, renditions, storage):
+    try:
+        make_renditions(name, renditions, storage)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+
+
+def schedule_renditions(image, renditions):
+    """
+    Ставит создание копий изображения в очередь пула потоков.
+    Обработка начинается после коммита транзакции, чтобы не задерживать
+    ответ и не обрабатывать файлы отмененных изменений.
+    """
+    if not image:
+        return
+    missing = [
+        rendition for rendition in renditions
+        if not is_ready(image.name, rendition, image.storage)
+    ]
+    if missing:
+        get_executor().submit(
+            run_make_renditions, image.name, missing, image.storage
+        )
@@ -0,0 +1,431 @@
+import heapq
+import logging
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import repeat
+
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .constants import (INGREDIENTS_INDEX_TTL, RECIPES_INGREDIENTS_INDEX_TTL,
+                        RECIPES_SEARCH_CONFIG, RECIPES_SEARCH_WEIGHTS,
+                        TAGS_INDEX_TTL)
+
+logger = logging.getLogger(__name__)
+
+MAX_CHAR = chr(0x10FFFF)
+WORD_RE = re.compile(r'\w+')
+FTS_TABLE = 'recipes_recipes_fts'
+FTS_TRIGGERS = {
+    'recipes_recipes_fts_insert': (
+        'CREATE TRIGGER IF NOT EXISTS recipes_recipes_fts_insert '
+        'AFTER INSERT ON recipes_recipes BEGIN '
+        'INSERT INTO recipes_recipes_fts(rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'
+    ),
+    'recipes_recipes_fts_delete': (
+        'CREATE TRIGGER IF NOT EXISTS recipes_recipes_fts_delete '
+        'AFTER DELETE ON recipes_recipes BEGIN '
+        'INSERT INTO recipes_recipes_fts'
+        '(recipes_recipes_fts, rowid, name, text) '
+        "VALUES ('delete', old.id, old.name, old.text); END"
+    ),
+    'recipes_recipes_fts_update': (
+        'CREATE TRIGGER IF NOT EXISTS recipes_recipes_fts_update '
+        'AFTER UPDATE OF name, text ON recipes_recipes BEGIN '
+        'INSERT INTO recipes_recipes_fts'
+        '(recipes_recipes_fts, rowid, name, text) '
+        "VALUES ('delete', old.id, old.name, old.text); "
+        'INSERT INTO recipes_recipes_fts(rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'
+    ),
+}
+
+
+class IngredientsIndex:
+    """
+    Индекс ингредиентов в памяти процесса для автодополнения на SQLite.
+    Хранит названия в нижнем регистре в отсортированном массиве, поэтому
+    совпадения по началу названия находятся двоичным поиском. Загружается
+    при первом запросе, сбрасывается сигналами при изменении ингредиентов
+    и перезагружается не реже раза в INGREDIENTS_INDEX_TTL секунд, чтобы
+    подхватить изменения из других процессов.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = []
+        self._ids = []
+        self._loaded_at = None
+
+    def invalidate(self):
+        """Сбрасывает индекс, он будет загружен заново при поиске."""
+        with self._lock:
+            self._loaded_at = None
+
+    def _load(self):
+        from .models import Ingredients
+
+        rows = sorted(
+            (name.lower(), pk)
+            for pk, name in Ingredients.objects.values_list('pk', 'name')
+        )
+        self._names = [name for name, _ in rows]
+        self._ids = [pk for _, pk in rows]
+        self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if (
+                self._loaded_at is None
+                or time.monotonic() - self._loaded_at > INGREDIENTS_INDEX_TTL
+            ):
+                self._load()
+            return self._names, self._ids
+
+    def search(self, value, limit=None):
+        """
+        Ищет ингредиенты, название которых содержит value без учета
+        регистра. Возвращает не больше limit id: сначала совпадения по
+        началу названия, затем остальные, каждая группа по алфавиту.
+        Просмотр названий останавливается, как только набрано limit id.
+        """
+        names, ids = self._ensure_loaded()
+        value = value.lower()
+        start = bisect_left(names, value)
+        end = bisect_left(names, value + MAX_CHAR, start)
+        found = ids[start:end][:limit]
+        for index, name in enumerate(names):
+            if limit is not None and len(found) >= limit:
+                break
+            if (index < start or index >= end) and value in name:
+                found.append(ids[index])
+        return found
+
+
+class TagsIndex:
+    """
+    Соответствие slug -> id тегов в памяти процесса. Фильтр рецептов
+    по тегам получает id без запроса к таблице тегов. Сбрасывается
+    сигналами и перезагружается не реже раза в TAGS_INDEX_TTL секунд.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._loaded_at = None
+
+    def invalidate(self):
+        """Сбрасывает индекс, он будет загружен заново при обращении."""
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self):
+        from .models import Tags
+
+        with self._lock:
+            if (
+                self._loaded_at is None
+                or time.monotonic() - self._loaded_at > TAGS_INDEX_TTL
+            ):
+                self._ids = dict(Tags.objects.values_list('slug', 'pk'))
+                self._loaded_at = time.monotonic()
+            return self._ids
+
+    def choices(self):
+        """Возвращает варианты для поля фильтра: пары (slug, slug)."""
+        return [(slug, slug) for slug in self._ensure_loaded()]
+
+    def ids(self, slugs):
+        """Возвращает id тегов по списку slug, неизвестные пропускает."""
+        ids = self._ensure_loaded()
+        return [ids[slug] for slug in slugs if slug in ids]
+
+
+class RecipesIngredientsIndex:
+    """
+    Обратный индекс ингредиент -> рецепты в памяти процесса для подбора
+    рецептов по имеющимся продуктам. Для каждого ингредиента хранится
+    отсортированный массив id рецептов (array, 8 байт на запись), для
+    каждого рецепта - число его ингредиентов. Загружается при первом
+    запросе, после записи рецепта обновляется только этот рецепт.
+    Изменения из других процессов подхватываются полной перезагрузкой
+    раз в RECIPES_INGREDIENTS_INDEX_TTL секунд. Перезагрузка идет
+    в фоновом потоке, поиск в это время работает по старому индексу.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._postings = {}
+        self._sizes = array('H')
+        self._expires_at = None
+        self._pending = None
+
+    def invalidate(self):
+        """Помечает индекс устаревшим, он будет перезагружен при поиске."""
+        with self._lock:
+            if self._expires_at is not None:
+                self._expires_at = 0
+
+    @staticmethod
+    def _build():
+        """Читает индекс из базы, возвращает массивы рецептов и размеры."""
+        from .models import RecipesIngredients
+
+        postings = {}
+        sizes = array('H')
+        previous = None
+        # Порядок индекса recipe_ingredient_idx: строки читаются без
+        # сортировки, а массивы рецептов сразу получаются упорядоченными.
+        rows = (
+            RecipesIngredients.objects
+            .order_by('recipe_id', 'ingredient_id')
+            .values_list('recipe_id', 'ingredient_id')
+            .iterator()
+        )
+        for recipe_id, ingredient_id in rows:
+            if (recipe_id, ingredient_id) == previous:
+                continue
+            previous = recipe_id, ingredient_id
+            postings.setdefault(ingredient_id, array('q')).append(recipe_id)
+            RecipesIngredientsIndex._grow(sizes, recipe_id)
+            sizes[recipe_id] += 1
+        return postings, sizes
+
+    def _reload(self):
+        """
+        Строит индекс без блокировки поиска и подменяет им текущий.
+        Рецепты, обновленные во время построения, могли попасть в новый
+        индекс в старом виде, поэтому после подмены они перечитываются.
+        Вызывается только под _reload_lock.
+        """
+        with self._lock:
+            self._pending = set()
+        try:
+            postings, sizes = self._build()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            self._postings = postings
+            self._sizes = sizes
+            self._expires_at = (
+                time.monotonic() + RECIPES_INGREDIENTS_INDEX_TTL
+            )
+            pending, self._pending = self._pending, None
+        if pending:
+            self.refresh(pending)
+
+    def _reload_in_background(self):
+        try:
+            self._reload()
+        except Exception:
+            logger.exception('Не удалось перезагрузить индекс ингредиентов')
+        finally:
+            self._reload_lock.release()
+            connections.close_all()
+
+    @staticmethod
+    def _grow(sizes, recipe_id):
+        """Дополняет массив числа ингредиентов нулями до recipe_id."""
+        if recipe_id >= len(sizes):
+            sizes.extend(repeat(0, recipe_id + 1 - len(sizes)))
+
+    def _ensure_loaded(self):
+        """
+        Первую загрузку выполняет один запрос, остальные ждут ее, а не
+        строят индекс повторно. Устаревший индекс перезагружается
+        в фоне.
+        """
+        if self._expires_at is None:
+            with self._reload_lock:
+                if self._expires_at is None:
+                    self._reload()
+        elif (
+            time.monotonic() > self._expires_at
+            and self._reload_lock.acquire(blocking=False)
+        ):
+            threading.Thread(
+                target=self._reload_in_background,
+                name='recipes-ingredients-index',
+                daemon=True
+            ).start()
+
+    def _remove(self, recipe_id):
+        for recipe_ids in self._postings.values():
+            index = bisect_left(recipe_ids, recipe_id)
+            if index < len(recipe_ids) and recipe_ids[index] == recipe_id:
+                del recipe_ids[index]
+        if recipe_id < len(self._sizes):
+            self._sizes[recipe_id] = 0
+
+    def refresh(self, recipe_ids):
+        """
+        Перечитывает ингредиенты рецептов из базы. Удаленные рецепты
+        убираются из индекса. Если индекс еще не загружен, ничего
+        не делает.
+        """
+        from .models import RecipesIngredients
+
+        with self._lock:
+            if self._pending is not None:
+                self._pending.update(recipe_ids)
+            if self._expires_at is None:
+                return
+        ingredients = {recipe_id: set() for recipe_id in recipe_ids}
+        for recipe_id, ingredient_id in (
+            RecipesIngredients.objects
+            .filter(recipe__in=ingredients)
+            .order_by()
+            .values_list('recipe', 'ingredient')
+        ):
+            ingredients[recipe_id].add(ingredient_id)
+        with self._lock:
+            for recipe_id, ingredient_ids in ingredients.items():
+                self._remove(recipe_id)
+                for ingredient_id in ingredient_ids:
+                    insort(
+                        self._postings.setdefault(ingredient_id, array('q')),
+                        recipe_id
+                    )
+                if ingredient_ids:
+                    self._grow(self._sizes, recipe_id)
+                    self._sizes[recipe_id] = len(ingredient_ids)
+
+    def rank(self, ingredient_ids):
+        """
+        Возвращает рецепты, в которых есть хотя бы один из ингредиентов,
+        как RankedRecipes.
+        """
+        matched = Counter()
+        self._ensure_loaded()
+        with self._lock:
+            for ingredient_id in set(ingredient_ids):
+                matched.update(self._postings.get(ingredient_id, ()))
+            sizes = array('H', self._sizes)
+        return RankedRecipes(matched, sizes)
+
+
+class RankedRecipes:
+    """
+    Результат RecipesIngredientsIndex.rank: последовательность кортежей
+    (id рецепта, найдено ингредиентов, всего ингредиентов). Сначала идут
+    рецепты с наибольшей долей имеющихся ингредиентов, затем с большим
+    числом совпадений, затем новые. Полная сортировка десятков тысяч
+    совпадений дороже самого подсчета, поэтому при срезе упорядочиваются
+    только рецепты до конца запрошенной страницы.
+    """
+    def __init__(self, matched, sizes):
+        self._matched = matched
+        self._sizes = sizes
+
+    def __len__(self):
+        return len(self._matched)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        sizes = self._sizes
+        top = heapq.nsmallest(
+            len(self) if key.stop is None else key.stop,
+            (
+                (-count / sizes[recipe_id], -count, -recipe_id)
+                for recipe_id, count in self._matched.items()
+            )
+        )
+        return [
+            (-recipe_id, -count, sizes[-recipe_id])
+            for _, count, recipe_id in top[key]
+        ]
+
+
+def fts_query(value):
+    """
+    Строит запрос FTS5 из строки пользователя: каждое слово ищется
+    по началу, чтобы находить другие словоформы, все слова через И.
+    Кавычки вокруг слов не дают интерпретировать их как операторы.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD_RE.findall(value))
+
+
+def search_recipes(queryset, value):
+    """
+    Отбирает рецепты по словам из названия и описания и аннотирует
+    релевантность search_rank (больше - лучше). На PostgreSQL ищет по
+    GIN-индексу генерируемой колонки search_vector, на SQLite - по
+    таблице FTS5 recipes_recipes_fts, на остальных базах - через LIKE.
+    """
+    table = queryset.model._meta.db_table
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        tsquery = 'websearch_to_tsquery(%s::regconfig, %s)'
+        params = (RECIPES_SEARCH_CONFIG, value)
+        return queryset.filter(
+            pk__in=RawSQL(
+                f'SELECT id FROM {table} WHERE search_vector @@ {tsquery}',
+                params
+            )
+        ).annotate(
+            search_rank=RawSQL(
+                f'ts_rank({table}.search_vector, {tsquery})',
+                params,
+                output_field=FloatField()
+            )
+        )
+    if vendor == 'sqlite':
+        match = fts_query(value)
+        if not match:
+            return queryset.annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+            ).none()
+        weights = ', '.join(str(weight) for weight in RECIPES_SEARCH_WEIGHTS)
+        # bm25() считается только при обходе самой таблицы FTS5, поэтому
+        # она присоединяется к рецептам. Коррелированный подзапрос
+        # заново выполнял бы поиск для каждой найденной строки.
+        return queryset.extra(
+            select={'search_rank': f'-bm25({FTS_TABLE}, {weights})'},
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE}.rowid = {table}.id',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[match],
+        )
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value)
+    ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def ensure_fts_triggers(connection):
+    """
+    Восстанавливает на SQLite триггеры, которые обновляют таблицу FTS5.
+    Миграции SQLite пересоздают таблицу рецептов при изменении полей,
+    и триггеры удаляются вместе со старой таблицей. Если триггеров
+    не было, индекс перестраивается.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master "
+            "WHERE type IN ('table', 'trigger') AND name LIKE %s",
+            (f'{FTS_TABLE}%',)
+        )
+        existing = {name for _, name in cursor.fetchall()}
+        missing = set(FTS_TRIGGERS) - existing
+        if FTS_TABLE not in existing or not missing:
+            return
+        for name in missing:
+            cursor.execute(FTS_TRIGGERS[name])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+ingredients_index = IngredientsIndex()
+recipes_ingredients_index = RecipesIngredientsIndex()
+tags_index = TagsIndex()
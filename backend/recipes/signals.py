@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from .models import Ingredients, Recipes, ShoppingCartItem, Tags
+from .renditions import schedule_renditions
+from .search import (ensure_fts_triggers, ingredients_index,
+                     recipes_ingredients_index, tags_index)
+
+
+@receiver((post_save, post_delete), sender=Ingredients)
+def invalidate_ingredients_index(sender, **kwargs):
+    """Сбрасывает индекс ингредиентов при их изменении."""
+    ingredients_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Tags)
+def invalidate_tags_index(sender, **kwargs):
+    """Сбрасывает индекс тегов при их изменении."""
+    tags_index.invalidate()
+
+
+@receiver(pre_delete, sender=Recipes)
+def remove_recipe_from_shopping_carts(sender, instance, **kwargs):
+    """
+    Убирает ингредиенты рецепта из суммарных списков покупок. Срабатывает
+    при любом удалении, в том числе каскадном при удалении автора.
+    """
+    user_ids = list(
+        instance.shoppinglist_recipes.values_list('user', flat=True)
+    )
+    if user_ids:
+        ShoppingCartItem.objects.remove_recipe(user_ids, instance)
+
+
+@receiver((post_save, post_delete), sender=Recipes)
+def refresh_recipes_ingredients_index(sender, instance, **kwargs):
+    """
+    Обновляет рецепт в индексе подбора по ингредиентам после коммита,
+    когда ингредиенты рецепта уже сохранены.
+    """
+    recipe_id = instance.pk
+    transaction.on_commit(
+        lambda: recipes_ingredients_index.refresh([recipe_id])
+    )
+
+
+@receiver(post_save, sender=Recipes)
+def make_recipe_image_renditions(sender, instance, **kwargs):
+    """Запускает создание уменьшенных копий фото блюда."""
+    image = instance.image
+    transaction.on_commit(
+        lambda: schedule_renditions(image, ('card', 'detail'))
+    )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def make_avatar_renditions(sender, instance, update_fields=None, **kwargs):
+    """
+    Запускает создание уменьшенных копий аватара, если он сменился.
+    Вход пользователя и правка профиля копии не трогают.
+    """
+    if update_fields is not None and 'avatar' not in update_fields:
+        return
+    if not instance.avatar_changed():
+        return
+    avatar = instance.avatar
+    transaction.on_commit(lambda: schedule_renditions(avatar, ('avatar',)))
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    """Восстанавливает триггеры полнотекстового поиска после миграций."""
+    if sender.name == 'recipes':
+        ensure_fts_triggers(connections[using])
@@ -0,0 +1,41 @@
+import hashlib
+import posixpath
+
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+
+
+class HashedFileSystemStorage(FileSystemStorage):
+    """
+    Хранилище, в котором имя файла определяется хешем его содержимого.
+    Одинаковые изображения хранятся в одном файле, а повторная загрузка
+    уже сохраненного файла не приводит к записи на диск.
+    Файлы не удаляются при замене, так как на них могут ссылаться другие
+    объекты. Неиспользуемые файлы удаляет команда collect_media_garbage.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    @staticmethod
+    def hashed_name(name, content):
+        """Возвращает путь вида <каталог>/<ab>/<sha256>.<расширение>."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), digest[:2], digest + extension
+        )
+
+
+hashed_storage = HashedFileSystemStorage()
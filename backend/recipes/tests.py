@@ -0,0 +1,245 @@
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+
+from . import renditions
+from .admin import RecipesAdmin
+from .constants import SHORT_LINK_CACHE_MAX_AGE, SHORT_LINK_LENGTH
+from .counters import recount_all
+from .models import Ingredients, Recipes, RecipesIngredients
+from .search import RecipesIngredientsIndex
+from .utils import SHORT_LINK_ALPHABET, SHORT_LINK_SPACE, encode_short_link
+from .views import resolve_short_link
+
+User = get_user_model()
+
+
+class RecipesAdminCountersTest(TestCase):
+    """Админка рецептов поддерживает счетчик рецептов авторов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{number}@example.com',
+                username=f'author{number}',
+                password='password',
+            )
+            for number in range(2)
+        ]
+        cls.recipe = Recipes.objects.create(
+            name='Рецепт', text='Описание', cooking_time=10,
+            author=cls.authors[0]
+        )
+        recount_all()
+
+    def save(self, changed_data, initial=None):
+        form = SimpleNamespace(changed_data=changed_data, initial=initial)
+        RecipesAdmin(Recipes, admin.site).save_model(
+            None, self.recipe, form, True
+        )
+
+    def recipes_counts(self):
+        return [
+            User.objects.get(pk=author.pk).recipes_count
+            for author in self.authors
+        ]
+
+    def test_author_change_moves_count(self):
+        self.recipe.author = self.authors[1]
+        self.save(['author'], {'author': self.authors[0].pk})
+        self.assertEqual(self.recipes_counts(), [0, 1])
+
+    def test_other_changes_keep_count(self):
+        self.recipe.name = 'Новое название'
+        self.save(['name'], {'author': self.authors[0].pk})
+        self.assertEqual(self.recipes_counts(), [1, 0])
+
+
+class ShortLinkTest(TestCase):
+    """
+    Короткие ссылки выводятся из первичного ключа: одинаковы при
+    повторном вызове, не совпадают у разных рецептов и перенаправляют
+    на страницу рецепта.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com', username='author', password='pw'
+        )
+        cls.recipe = Recipes.objects.create(
+            name='Рецепт', text='Описание', cooking_time=10, author=author
+        )
+
+    def setUp(self):
+        resolve_short_link.cache_clear()
+
+    def test_deterministic(self):
+        self.assertEqual(encode_short_link(42), encode_short_link(42))
+        self.assertEqual(
+            self.recipe.short_link, encode_short_link(self.recipe.pk)
+        )
+
+    def test_unique(self):
+        links = [encode_short_link(pk) for pk in range(1, 20001)]
+        self.assertEqual(len(set(links)), len(links))
+        for link in links[:100]:
+            self.assertEqual(len(link), SHORT_LINK_LENGTH)
+            self.assertTrue(set(link) <= set(SHORT_LINK_ALPHABET))
+
+    def test_out_of_range(self):
+        for pk in (0, SHORT_LINK_SPACE):
+            with self.subTest(pk=pk), self.assertRaises(ValueError):
+                encode_short_link(pk)
+
+    def test_redirect(self):
+        response = self.client.get(f'/s/{self.recipe.short_link}/')
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response['Location'], f'/recipes/{self.recipe.pk}/')
+        self.assertIn(
+            f'max-age={SHORT_LINK_CACHE_MAX_AGE}', response['Cache-Control']
+        )
+        self.assertEqual(self.client.get('/s/unknown/').status_code, 404)
+
+    def test_get_link(self):
+        response = self.client.get(f'/api/recipes/{self.recipe.pk}/get-link/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['short-link'],
+            f'http://testserver/s/{self.recipe.short_link}'
+        )
+
+
+class AvatarRenditionsTest(TestCase):
+    """
+    Копии аватара создаются только при его смене и пишутся в хранилище
+    поля изображения.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(
+            email='user@example.com', username='user', password='password'
+        )
+        User.objects.filter(pk=user.pk).update(avatar='images/old.png')
+        cls.user_id = user.pk
+
+    def setUp(self):
+        self.user = User.objects.get(pk=self.user_id)
+
+    def scheduled(self, save):
+        with mock.patch(
+            'recipes.signals.schedule_renditions'
+        ) as schedule, self.captureOnCommitCallbacks(execute=True):
+            save()
+        return schedule.call_count
+
+    def test_login_skips_renditions(self):
+        self.assertEqual(
+            self.scheduled(lambda: self.client.post(
+                '/api/auth/token/login/',
+                {'email': 'user@example.com', 'password': 'password'}
+            )),
+            0
+        )
+
+    def test_profile_change_skips_renditions(self):
+        self.user.first_name = 'Имя'
+        self.assertEqual(self.scheduled(self.user.save), 0)
+
+    def test_avatar_change_schedules_renditions_once(self):
+        self.user.avatar = 'images/new.png'
+        self.assertEqual(self.scheduled(self.user.save), 1)
+        self.assertEqual(self.scheduled(self.user.save), 0)
+
+    def test_renditions_use_field_storage(self):
+        image = self.user.avatar
+        executor = mock.Mock()
+        with mock.patch.object(
+            renditions, 'get_executor', return_value=executor
+        ), mock.patch.object(renditions, 'is_ready', return_value=False):
+            renditions.schedule_renditions(image, ('avatar',))
+        executor.submit.assert_called_once_with(
+            renditions.run_make_renditions, image.name, ['avatar'],
+            image.storage
+        )
+
+
+class RecipesIngredientsIndexReloadTest(TransactionTestCase):
+    """
+    Устаревший индекс перезагружается в фоне: поиск не ждет построения
+    нового индекса, а обновления рецептов за это время не теряются.
+    """
+    TIMEOUT = 5
+
+    def setUp(self):
+        self.author = User.objects.create_user(
+            email='author@example.com', username='author', password='pw'
+        )
+        self.ingredient = Ingredients.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+        self.index = RecipesIngredientsIndex()
+        self.building = threading.Event()
+        self.release = threading.Event()
+
+    def create_recipe(self):
+        recipe = Recipes.objects.create(
+            name='Рецепт', text='Описание', cooking_time=10,
+            author=self.author
+        )
+        RecipesIngredients.objects.create(
+            recipe=recipe, ingredient=self.ingredient, amount=10
+        )
+        return recipe
+
+    def blocked_build(self):
+        """Строит индекс по базе и ждет release перед подменой."""
+        def build():
+            result = RecipesIngredientsIndex._build()
+            self.building.set()
+            self.release.wait(self.TIMEOUT)
+            return result
+        return mock.patch.object(self.index, '_build', build)
+
+    def found(self):
+        return [row[0] for row in self.index.rank([self.ingredient.pk])[:]]
+
+    def wait_reloaded(self):
+        deadline = time.monotonic() + self.TIMEOUT
+        while self.index._reload_lock.locked():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_search_uses_old_index_while_reloading(self):
+        old = self.create_recipe()
+        self.assertEqual(self.found(), [old.pk])
+        self.index.invalidate()
+        with self.blocked_build():
+            new = self.create_recipe()
+            self.assertEqual(self.found(), [old.pk])
+            self.assertTrue(self.building.wait(self.TIMEOUT))
+            self.assertEqual(self.found(), [old.pk])
+            self.release.set()
+            self.wait_reloaded()
+        self.assertEqual(self.found(), [new.pk, old.pk])
+
+    def test_refresh_during_reload_is_kept(self):
+        old = self.create_recipe()
+        self.assertEqual(self.found(), [old.pk])
+        self.index.invalidate()
+        with self.blocked_build():
+            self.found()
+            self.assertTrue(self.building.wait(self.TIMEOUT))
+            new = self.create_recipe()
+            self.index.refresh([new.pk])
+            self.assertEqual(self.found(), [new.pk, old.pk])
+            self.release.set()
+            self.wait_reloaded()
+        self.assertEqual(self.found(), [new.pk, old.pk])
@@ -1,25 +1,74 @@
-import random
+import hashlib
+import hmac
 import string
 
-from .constants import MAX_LINK_LENGTH, SHORT_LINK_LENGTH
+from django.conf import settings
+from django.db.models import Count, Max
 
+from .constants import SHORT_LINK_LENGTH
 
-def generate_short_link(length=SHORT_LINK_LENGTH):
-    """Генерирует короткую ссылку."""
-    return (
-        ''.join(random.choices(string.ascii_letters + string.digits, k=length))
-    )
+SHORT_LINK_ALPHABET = string.digits + string.ascii_letters
+SHORT_LINK_SPACE = len(SHORT_LINK_ALPHABET) ** SHORT_LINK_LENGTH
+FEISTEL_HALF_BITS = 15
+FEISTEL_MASK = (1 << FEISTEL_HALF_BITS) - 1
+FEISTEL_ROUNDS = 4
+
+
+def feistel_round(value, round_number):
+    """Раундовая функция сети Фейстеля на HMAC от ключа коротких ссылок."""
+    digest = hmac.new(
+        settings.SHORT_LINK_KEY.encode(),
+        f'{round_number}:{value}'.encode(),
+        hashlib.sha256
+    ).digest()
+    return int.from_bytes(digest[:4], 'big') & FEISTEL_MASK
+
+
+def feistel(value):
+    """Взаимно однозначно перемешивает 30-битное число."""
+    left, right = value >> FEISTEL_HALF_BITS, value & FEISTEL_MASK
+    for round_number in range(FEISTEL_ROUNDS):
+        left, right = right, left ^ feistel_round(right, round_number)
+    return (left << FEISTEL_HALF_BITS) | right
 
 
-def unique_link():
-    """Возвращает уникальную короткую ссылку для рецепта."""
-    from .models import Recipes
+def encode_short_link(pk):
+    """
+    Возвращает короткую ссылку для рецепта по его первичному ключу.
+    Ключ перемешивается сетью Фейстеля в пределах SHORT_LINK_SPACE
+    и записывается в base62, поэтому разные ключи всегда дают разные
+    ссылки и проверять уникальность в базе не нужно. Ссылки имеют длину
+    SHORT_LINK_LENGTH, меньшую длины случайных ссылок, которые
+    создавались раньше, поэтому с ними они тоже не совпадают.
+    """
+    if not 0 < pk < SHORT_LINK_SPACE:
+        raise ValueError('Не удалось сгенерировать уникальную ссылку')
+    value = feistel(pk)
+    while value >= SHORT_LINK_SPACE:
+        value = feistel(value)
+    chars = []
+    for _ in range(SHORT_LINK_LENGTH):
+        value, index = divmod(value, len(SHORT_LINK_ALPHABET))
+        chars.append(SHORT_LINK_ALPHABET[index])
+    return ''.join(reversed(chars))
 
-    for attempt in range(MAX_LINK_LENGTH - SHORT_LINK_LENGTH + 1):
-        link_length = SHORT_LINK_LENGTH + attempt
-        short_link = generate_short_link(link_length)
-        if (
-            not Recipes.objects.filter(short_link=short_link).exists()
-        ):
-            return short_link
-    raise ValueError('Не удалось сгенерировать уникальную ссылку')
+
+def shopping_cart_version(user):
+    """
+    Возвращает отметку версии списка покупок пользователя.
+    Отметка меняется при добавлении или удалении рецептов из списка
+    и при изменении любого рецепта в нем.
+    """
+    from .models import ShoppingList
+
+    version = ShoppingList.objects.filter(user=user).aggregate(
+        count=Count('id'),
+        last_id=Max('id'),
+        updated_at=Max('recipe__updated_at'),
+    )
+    updated_at = version['updated_at']
+    return '{}-{}-{}'.format(
+        version['count'],
+        version['last_id'] or 0,
+        int(updated_at.timestamp() * 1000000) if updated_at else 0,
+    )
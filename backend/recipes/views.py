@@ -1,14 +1,33 @@
+from functools import lru_cache
+
 from django.http import Http404
 from django.shortcuts import redirect
+from django.utils.cache import patch_cache_control
 
+from .constants import SHORT_LINK_CACHE_MAX_AGE, SHORT_LINK_CACHE_SIZE
 from .models import Recipes
 
 
-def short_link_redirect(request, short_link):
-    """Перенаправляет по короткой ссылке."""
+@lru_cache(maxsize=SHORT_LINK_CACHE_SIZE)
+def resolve_short_link(short_link):
+    """
+    Возвращает id рецепта по короткой ссылке. Ссылка рецепта не
+    меняется, поэтому найденные значения кешируются в памяти процесса.
+    """
     try:
-        recipe = Recipes.objects.get(short_link=short_link)
+        return Recipes.objects.values_list('id', flat=True).get(
+            short_link=short_link
+        )
     except Recipes.DoesNotExist:
         raise Http404('Короткая ссылка не существует.')
 
-    return redirect(f'/recipes/{recipe.id}/')
+
+def short_link_redirect(request, short_link):
+    """Перенаправляет по короткой ссылке."""
+    response = redirect(
+        f'/recipes/{resolve_short_link(short_link)}/', permanent=True
+    )
+    patch_cache_control(
+        response, public=True, max_age=SHORT_LINK_CACHE_MAX_AGE
+    )
+    return response
@@ -4,6 +4,10 @@ from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group
 from django.utils.html import format_html
 
+from recipes.counters import recount, users_counters
+
+from .models import Subscriptions
+
 User = get_user_model()
 
 
@@ -26,4 +30,34 @@ class ExtendedUserAdmin(UserAdmin):
     )
 
 
+@admin.register(Subscriptions)
+class SubscriptionsAdmin(admin.ModelAdmin):
+    """
+    Админка для подписок. Пересчитывает счетчики подписчиков
+    затронутых авторов после правки.
+    """
+    list_display = ('id', 'user', 'following')
+    search_fields = ('user__username', 'following__username')
+    autocomplete_fields = ('user', 'following')
+
+    def recount_authors(self, author_ids):
+        recount(User.objects.filter(pk__in=author_ids), users_counters())
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        author_ids = [obj.following_id]
+        if change and 'following' in form.initial:
+            author_ids.append(form.initial['following'])
+        self.recount_authors(author_ids)
+
+    def delete_queryset(self, request, queryset):
+        author_ids = list(queryset.values_list('following', flat=True))
+        super().delete_queryset(request, queryset)
+        self.recount_authors(author_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.recount_authors([obj.following_id])
+
+
 admin.site.unregister(Group)
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='extendeduser',
+            index=models.Index(fields=['-date_joined', 'username', 'id'], name='users_list_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:32
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_users_list_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='extendeduser',
+            name='avatar',
+            field=models.ImageField(blank=True, default=None, null=True, storage=recipes.storage.HashedFileSystemStorage(), upload_to='images/', verbose_name='Аватар'),
+        ),
+    ]
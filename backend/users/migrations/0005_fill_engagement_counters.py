@@ -0,0 +1,42 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0
+    )
+
+
+def fill_engagement_counters(apps, schema_editor):
+    """Заполняет счетчики рецептов и подписчиков пользователей."""
+    ExtendedUser = apps.get_model('users', 'ExtendedUser')
+    Recipes = apps.get_model('recipes', 'Recipes')
+    Subscriptions = apps.get_model('users', 'Subscriptions')
+    ExtendedUser.objects.update(
+        recipes_count=count_related(Recipes, 'author'),
+        followers_count=count_related(Subscriptions, 'following')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_engagement_counters'),
+        ('recipes', '0012_engagement_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            fill_engagement_counters, migrations.RunPython.noop
+        ),
+    ]
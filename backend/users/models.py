@@ -4,6 +4,8 @@ from django.core.validators import (EmailValidator, MaxLengthValidator,
                                     MinLengthValidator, RegexValidator)
 from django.db import models
 
+from recipes.storage import hashed_storage
+
 from .constants import (EMAIL_FIELD_MAX_LENGTH, EMAIL_FIELD_MIN_LENGTH,
                         USERNAME_FIELD_MAX_LENGTH, USERNAME_FIELD_MIN_LENGTH)
 
@@ -53,9 +55,20 @@ class ExtendedUser(AbstractUser):
         'Аватар',
         blank=True,
         upload_to='images/',
+        storage=hashed_storage,
         null=True,
         default=None
     )
+    recipes_count = models.PositiveIntegerField(
+        'Рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+        editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -64,10 +77,33 @@ class ExtendedUser(AbstractUser):
         verbose_name = 'Пользователь'
         verbose_name_plural = 'пользователи'
         ordering = ['-date_joined', 'username']
+        indexes = [
+            models.Index(
+                fields=['-date_joined', 'username', 'id'],
+                name='users_list_idx'
+            ),
+        ]
+
+    _loaded_avatar = None
 
     def __str__(self):
         return self.username
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает аватар, загруженный из базы."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_avatar = instance.__dict__.get('avatar') or None
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._loaded_avatar = self.avatar.name or None
+
+    def avatar_changed(self):
+        """Проверяет, сменился ли аватар с загрузки из базы."""
+        return (self.avatar.name or None) != self._loaded_avatar
+
 
 class Subscriptions(models.Model):
     """Модель для подписок пользователей."""
@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from recipes.counters import recount_all
+
+from .models import Subscriptions
+
+User = get_user_model()
+
+
+def create_user(username, **kwargs):
+    return User.objects.create_user(
+        email=f'{username}@example.com',
+        username=username,
+        password='password',
+        first_name='Имя',
+        last_name='Фамилия',
+        **kwargs
+    )
+
+
+class SubscriptionsAdminCountersTest(TestCase):
+    """Админка подписок поддерживает счетчик подписчиков авторов."""
+    URL = '/admin/users/subscriptions/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user('admin', is_staff=True, is_superuser=True)
+        cls.reader = create_user('reader')
+        cls.authors = [create_user(f'author{number}') for number in range(2)]
+        recount_all()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def followers_counts(self):
+        return [
+            User.objects.get(pk=author.pk).followers_count
+            for author in self.authors
+        ]
+
+    def test_add_and_change(self):
+        response = self.client.post(f'{self.URL}add/', {
+            'user': self.reader.pk, 'following': self.authors[0].pk
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.followers_counts(), [1, 0])
+        subscription = Subscriptions.objects.get()
+        response = self.client.post(f'{self.URL}{subscription.pk}/change/', {
+            'user': self.reader.pk, 'following': self.authors[1].pk
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.followers_counts(), [0, 1])
+
+    def test_delete(self):
+        subscriptions = [
+            Subscriptions.objects.create(user=self.reader, following=author)
+            for author in self.authors
+        ]
+        recount_all()
+        response = self.client.post(
+            f'{self.URL}{subscriptions[0].pk}/delete/', {'post': 'yes'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.followers_counts(), [0, 1])
+        response = self.client.post(self.URL, {
+            'action': 'delete_selected',
+            '_selected_action': [subscriptions[1].pk],
+            'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.followers_counts(), [0, 0])